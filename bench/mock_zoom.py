@@ -0,0 +1,210 @@
+import logging
+from base64 import urlsafe_b64encode
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+from urllib.parse import urlsplit, unquote
+import asyncio
+import json
+import random
+import time
+
+logger = logging.getLogger("bench")
+
+def fake_jwt(expires_in: int = 3600) -> str:
+    def part(data):
+        return urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+    return ".".join([
+        part({"alg": "none", "typ": "JWT"}),
+        part({"exp": int(time.time()) + expires_in}),
+        "bench",
+    ])
+
+
+class MockZoom:
+
+    def __init__(
+        self,
+        latency: float = 0.02,
+        jitter: float = 0.01,
+        rate_429: float = 0.0,
+        registrants: int = 50,
+        recording_files: int = 4,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.registrants = registrants
+        self.recording_files = recording_files
+        self.host = host
+        self.port = port
+
+        self.calls: Counter = Counter()
+        self.throttled = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def api_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v2/"
+
+    @property
+    def auth_url(self) -> str:
+        return f"http://{self.host}:{self.port}/oauth/token"
+
+    @property
+    def total_calls(self) -> int:
+        return sum(count for kind, count in self.calls.items() if kind != "oauth")
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Mock Zoom listening on {self.host}:{self.port}")
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode().split(" ", 2)
+
+                content_length = 0
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode().partition(":")
+                    if name.strip().lower() == "content-length":
+                        content_length = int(value.strip())
+                if content_length:
+                    await reader.readexactly(content_length)
+
+                await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+                status, body = self._route(method, target)
+
+                payload = json.dumps(body).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status < 400 else 'ERROR'}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: keep-alive\r\n\r\n".encode() + payload
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _route(self, method: str, target: str) -> Tuple[int, dict]:
+        path = urlsplit(target).path
+
+        if path == "/oauth/token":
+            self.calls["oauth"] += 1
+            return 200, {"access_token": fake_jwt(), "token_type": "bearer", "expires_in": 3600}
+
+        if self.rate_429 and random.random() < self.rate_429:
+            self.throttled += 1
+            return 429, {"code": 429, "message": "You have reached the maximum per-second rate limit."}
+
+        # split before decoding so double-encoded meeting UUIDs stay one segment
+        parts = [unquote(unquote(part)) for part in path.removeprefix("/v2/").split("/") if part]
+        if len(parts) == 2 and parts[0] == "meetings":
+            self.calls["meeting"] += 1
+            return 200, self.meeting(parts[1])
+        if len(parts) == 2 and parts[0] == "users":
+            self.calls["user"] += 1
+            return 200, {"id": f"u-{parts[1]}", "first_name": "Bench", "last_name": "User", "type": 2}
+        if len(parts) == 3 and parts[0] == "meetings" and parts[2] == "registrants":
+            self.calls["registrants"] += 1
+            return 200, {"registrants": [self.registrant(parts[1], i) for i in range(self.registrants)]}
+        if len(parts) == 3 and parts[0] == "past_meetings" and parts[2] == "participants":
+            self.calls["participants"] += 1
+            return 200, {"participants": [
+                {"email": f"r{i}@bench.local"} for i in range(0, self.registrants, 2)
+            ]}
+        if len(parts) == 2 and parts[0] == "past_meetings":
+            self.calls["past_meeting"] += 1
+            return 200, self.past_meeting(parts[1])
+        if len(parts) == 3 and parts[0] == "meetings" and parts[2] == "recordings":
+            self.calls["recordings"] += 1
+            return 200, self.recording(parts[1])
+
+        self.calls["unknown"] += 1
+        return 404, {"code": 3001, "message": "Not found"}
+
+    def meeting(self, meeting_id) -> dict:
+        start = datetime.now(timezone.utc) + timedelta(days=1)
+        return {
+            "id": int(meeting_id) if str(meeting_id).isdigit() else meeting_id,
+            "uuid": f"uuid-{meeting_id}==",
+            "host_id": f"h-{int(meeting_id) % 10 if str(meeting_id).isdigit() else 0}",
+            "host_email": f"host{int(meeting_id) % 10 if str(meeting_id).isdigit() else 0}@bench.local",
+            "type": 2,
+            "topic": f"Bench meeting {meeting_id}",
+            "start_time": start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "timezone": "UTC",
+            "duration": 60,
+            "creation_source": "open_api",
+            "settings": {"alternative_hosts": ""},
+        }
+
+    def past_meeting(self, meeting_id) -> dict:
+        end = datetime.now(timezone.utc) - timedelta(hours=1)
+        start = end - timedelta(minutes=55)
+        return {
+            "id": meeting_id,
+            "uuid": f"uuid-{meeting_id}==",
+            "start_time": start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "end_time": end.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "duration": 55,
+        }
+
+    def registrant(self, meeting_id, i: int) -> dict:
+        return {
+            "id": f"reg-{meeting_id}-{i}",
+            "email": f"r{i}@bench.local",
+            "first_name": "Reg",
+            "last_name": str(i),
+            "join_url": f"https://zoom.us/w/{meeting_id}?tk={i}",
+        }
+
+    def recording(self, meeting_uuid) -> dict:
+        return recording_object(meeting_uuid, meeting_uuid, self.recording_files)
+
+
+def recording_object(meeting_id, meeting_uuid, files: int) -> dict:
+    end = datetime.now(timezone.utc) - timedelta(minutes=5)
+    start = end - timedelta(minutes=55)
+    return {
+        "id": meeting_id,
+        "uuid": meeting_uuid,
+        "share_url": f"https://zoom.us/rec/share/{meeting_uuid}",
+        "duration": 55,
+        "start_time": start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "timezone": "UTC",
+        "recording_count": files,
+        "recording_files": [
+            {
+                "id": f"file-{meeting_uuid}-{i}",
+                "meeting_id": meeting_uuid,
+                "recording_start": start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "recording_end": end.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "file_type": "MP4" if i % 2 == 0 else "M4A",
+                "file_extension": "MP4" if i % 2 == 0 else "M4A",
+                "file_size": 1024 * 1024 * (i + 1),
+                "play_url": f"https://zoom.us/rec/play/{meeting_uuid}/{i}",
+                "download_url": f"https://zoom.us/rec/download/{meeting_uuid}/{i}",
+                "status": "completed",
+                "recording_type": "shared_screen_with_speaker_view" if i % 2 == 0 else "audio_only",
+            }
+            for i in range(files)
+        ],
+    }
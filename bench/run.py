@@ -0,0 +1,298 @@
+# End-to-end benchmark for the zoom.event pipeline.
+#
+#   python -m bench.run                                  # all scenarios, compare to saved baselines
+#   python -m bench.run -s recording_burst -n 500 --save-baseline
+#   BENCH_MYSQL_HOST=127.0.0.1 BENCH_NATS_URL=nats://127.0.0.1:4222 python -m bench.run
+#
+# Starts nats-server and mariadbd (unless BENCH_* point at running ones) plus a mock
+# Zoom API, replays synthetic webhook streams through the real handlers in-process and
+# reports throughput, end-to-end latency, DB round trips and Zoom calls per event.
+
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from bench.mock_zoom import MockZoom
+from bench.scenarios import SCENARIOS
+from bench.services import LocalServices
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+BASELINE_DIR = BASE_DIR / "bench" / "baselines"
+
+RESET_TABLES = [
+    "`kopilot_events`.`raw_events`",
+    "`kopilot_zoom`.`registrant`",
+    "`kopilot_zoom`.`recording_file`",
+    "`kopilot_zoom`.`attendance`",
+    "`kopilot_zoom`.`recording`",
+    "`kopilot_zoom`.`host`",
+    "`kopilot_zoom`.`meeting`",
+    "`kopilot_zoom`.`user`",
+]
+
+RAW_EVENT_INSERT = """
+INSERT INTO `kopilot_events`.`raw_events` (`id`, `payload`) VALUES (%s, %s);
+"""
+
+logger = logging.getLogger("bench")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay synthetic Zoom webhooks through the event pipeline.")
+    parser.add_argument("-s", "--scenario", action="append", choices=sorted(SCENARIOS), help="repeatable; default all")
+    parser.add_argument("-n", "--events", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=0, help="publish rate in events/s, 0 for as fast as possible")
+    parser.add_argument("--zoom-latency", type=float, default=0.02)
+    parser.add_argument("--zoom-429", type=float, default=0.0, help="fraction of Zoom API calls answered with 429")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--no-compare", action="store_true")
+    parser.add_argument("--output", type=Path, help="write results as JSON")
+    parser.add_argument("--keep", action="store_true", help="keep the work directory with server logs")
+    return parser.parse_args()
+
+
+def configure_env(services: LocalServices, mock: MockZoom, workdir: Path):
+    os.environ.update({
+        "LOG_PATH": f"{workdir}/",
+        "NATS_URL": services.nats_url,
+        "MYSQL_HOST": services.mysql["host"],
+        "MYSQL_PORT": str(services.mysql["port"]),
+        "MYSQL_USER": services.mysql["user"],
+        "MYSQL_PASSWORD": services.mysql["password"],
+        "MYSQL_DATABASE": "kopilot_zoom",
+        "ZOOM_API_URL": mock.api_url,
+        "ZOOM_AUTH_URL": mock.auth_url,
+        "ZOOM_CLIENT_ID": "bench",
+        "ZOOM_CLIENT_SECRET": "bench",
+        "ZOOM_ACCOUNT_ID": "bench",
+        "ZOOM_TOKEN_STORE": "memory",
+    })
+    os.environ.pop("DEDUPE_PATH", None)
+
+
+class RoundTrips:
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def instrument(self, db):
+        for name in ("execute_query", "execute_update", "execute_insert", "execute_many"):
+            original = getattr(db, name)
+
+            def counted(*args, _original=original, **kwargs):
+                with self._lock:
+                    self.count += 1
+                return _original(*args, **kwargs)
+
+            setattr(db, name, staticmethod(counted))
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def settle(probe, quiet: float = 1.0, limit: float = 60):
+    # cascades (zoom.sync.*) keep running after the last event is acknowledged
+    deadline = time.monotonic() + limit
+    last = probe()
+    quiet_since = time.monotonic()
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+        current = probe()
+        if current != last:
+            last, quiet_since = current, time.monotonic()
+        elif time.monotonic() - quiet_since >= quiet:
+            return
+
+
+async def run_scenario(name: str, args, services: LocalServices, mock: MockZoom, trips: RoundTrips, id_base: int) -> Dict[str, Any]:
+    import mysql.connector
+    import nats
+
+    seed, stream = SCENARIOS[name](args.events)
+    services.reset(RESET_TABLES)
+
+    con = mysql.connector.connect(**services.mysql)
+    try:
+        cursor = con.cursor()
+        for query, rows in seed:
+            if rows:
+                cursor.executemany(query, rows)
+        cursor.executemany(RAW_EVENT_INSERT, [
+            (id_base + i, json.dumps(event)) for i, event in enumerate(stream)
+        ])
+        con.commit()
+        cursor.close()
+    finally:
+        con.close()
+
+    observer = await nats.connect(services.nats_url, name="kopilot_zoom_bench")
+    sent: Dict[int, float] = {}
+    latencies: List[float] = []
+    errors = 0
+    done = asyncio.Event()
+
+    async def on_result(msg):
+        nonlocal errors
+        data = json.loads(msg.data.decode())
+        started = sent.pop(data.get("event_id"), None)
+        if started is None:
+            return
+        latencies.append(time.perf_counter() - started)
+        if msg.subject == "zoom.event.error_processing":
+            errors += 1
+        if len(latencies) == len(stream):
+            done.set()
+
+    await observer.subscribe("zoom.event.processed", cb=on_result)
+    await observer.subscribe("zoom.event.error_processing", cb=on_result)
+    await observer.flush()
+
+    trips_before = trips.count
+    zoom_before = mock.total_calls
+    throttled_before = mock.throttled
+    interval = 1 / args.rate if args.rate else 0
+
+    started = time.perf_counter()
+    for i, event in enumerate(stream):
+        event_id = id_base + i
+        sent[event_id] = time.perf_counter()
+        await observer.publish("zoom.event", json.dumps({
+            "event_id": event_id,
+            "timestamp": datetime.now().isoformat(),
+            "event": event,
+        }).encode())
+        if interval:
+            await asyncio.sleep(max(0.0, started + (i + 1) * interval - time.perf_counter()))
+    await observer.flush()
+
+    timed_out = False
+    try:
+        await asyncio.wait_for(done.wait(), timeout=args.timeout)
+    except asyncio.TimeoutError:
+        timed_out = True
+        logger.error(f"{name}: {len(sent)} events unacknowledged after {args.timeout}s")
+    elapsed = time.perf_counter() - started
+
+    await settle(lambda: (trips.count, mock.total_calls))
+    await observer.close()
+
+    events = len(stream)
+    return {
+        "scenario": name,
+        "events": events,
+        "acknowledged": len(latencies),
+        "errors": errors,
+        "timed_out": timed_out,
+        "duration_s": round(elapsed, 3),
+        "events_per_s": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "db_round_trips_per_event": round((trips.count - trips_before) / events, 3) if events else 0.0,
+        "zoom_calls_per_event": round((mock.total_calls - zoom_before) / events, 3) if events else 0.0,
+        "zoom_429": mock.throttled - throttled_before,
+    }
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    if result["events_per_s"] < baseline["events_per_s"] * (1 - tolerance):
+        regressions.append(f"events/s {result['events_per_s']} < baseline {baseline['events_per_s']}")
+    if result["p99_ms"] > baseline["p99_ms"] * (1 + tolerance):
+        regressions.append(f"p99 {result['p99_ms']}ms > baseline {baseline['p99_ms']}ms")
+    # round-trip counts are deterministic, so any increase is a regression
+    for key in ("db_round_trips_per_event", "zoom_calls_per_event"):
+        if result[key] > baseline[key] + 0.01:
+            regressions.append(f"{key} {result[key]} > baseline {baseline[key]}")
+    if result["errors"] > baseline.get("errors", 0) or result["timed_out"]:
+        regressions.append(f"errors {result['errors']} (timed out: {result['timed_out']})")
+    return regressions
+
+
+def report(results: List[Dict[str, Any]]):
+    columns = ["scenario", "events", "events_per_s", "p50_ms", "p99_ms", "db_round_trips_per_event", "zoom_calls_per_event", "errors"]
+    widths = [max(len(col), *(len(str(r[col])) for r in results)) for col in columns]
+    print("  ".join(col.ljust(w) for col, w in zip(columns, widths)))
+    for result in results:
+        print("  ".join(str(result[col]).ljust(w) for col, w in zip(columns, widths)))
+
+
+async def bench(args, workdir: Path) -> int:
+    services = LocalServices(workdir)
+    mock = MockZoom(latency=args.zoom_latency, jitter=args.zoom_latency / 2, rate_429=args.zoom_429)
+    try:
+        await mock.start()
+        services.start_nats()
+        services.start_mysql()
+        configure_env(services, mock, workdir)
+        services.load_schema(BASE_DIR)
+
+        from common.mysql import MySQL
+        from common.nats_server import nc
+        import handlers
+        handlers.discover("all")
+
+        trips = RoundTrips()
+        trips.instrument(MySQL)
+        await nc.connect()
+
+        results = []
+        for index, name in enumerate(args.scenario or sorted(SCENARIOS)):
+            logger.info(f"Running {name} with {args.events} events")
+            results.append(await run_scenario(name, args, services, mock, trips, (index + 1) * 10_000_000))
+
+        await nc.drain()
+    finally:
+        await mock.stop()
+        services.stop()
+
+    report(results)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+    status = 0
+    for result in results:
+        baseline_path = BASELINE_DIR / f"{result['scenario']}.json"
+        if args.save_baseline:
+            BASELINE_DIR.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps({**result, "saved_at": datetime.now().isoformat()}, indent=2))
+            print(f"Saved baseline {baseline_path.relative_to(BASE_DIR)}")
+        elif not args.no_compare and baseline_path.exists():
+            regressions = compare(result, json.loads(baseline_path.read_text()), args.tolerance)
+            for regression in regressions:
+                print(f"REGRESSION {result['scenario']}: {regression}")
+            status = status or (1 if regressions else 0)
+    return status
+
+
+def main():
+    args = parse_args()
+    workdir = Path(tempfile.mkdtemp(prefix="kopilot_bench_"))
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(asctime)s %(name)s %(message)s")
+    try:
+        status = asyncio.run(bench(args, workdir))
+    finally:
+        if args.keep:
+            print(f"Work directory kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    sys.exit(status)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Tuple, Callable
+import time
+
+from bench.mock_zoom import recording_object
+
+SEED_USER = """
+INSERT IGNORE INTO `kopilot_zoom`.`user` (`email`, `zoom_user_id`) VALUES (%s, %s);
+"""
+
+SEED_MEETING = """
+INSERT IGNORE INTO `kopilot_zoom`.`meeting` (
+    `meeting_id`, `topic`, `start_time`, `schedule_for`, `meeting_uuid`, `duration`, `actual_start_time`, `actual_end_time`
+) VALUES (%s, %s, %s, %s, %s, %s, %s, %s);
+"""
+
+SEED_REGISTRANT = """
+INSERT IGNORE INTO `kopilot_zoom`.`registrant` (
+    `meeting_id`, `email`, `zoom_registrant_id`, `first_name`, `last_name`, `join_url`
+) VALUES (%s, %s, %s, %s, %s, %s);
+"""
+
+BASE_MEETING_ID = 90_000_000_000
+
+def _iso(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def _envelope(event_type: str, object: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "event": event_type,
+        "event_ts": int(time.time() * 1000),
+        "payload": {
+            "account_id": "bench",
+            "object": object,
+        },
+    }
+
+def _seed_meetings(count: int, registrants: int, ended: bool = False) -> List[Tuple[str, list]]:
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    users = [(f"host{i}@bench.local", f"h-{i}") for i in range(10)]
+    meetings = []
+    registrant_rows = []
+    for n in range(count):
+        meeting_id = BASE_MEETING_ID + n
+        start = now - timedelta(hours=2) if ended else now
+        meetings.append((
+            meeting_id,
+            f"Bench meeting {meeting_id}",
+            start,
+            f"host{n % 10}@bench.local",
+            f"uuid-{meeting_id}==",
+            60,
+            start if ended else None,
+            start + timedelta(minutes=55) if ended else None,
+        ))
+        registrant_rows.extend(
+            (meeting_id, f"r{i}@bench.local", f"reg-{meeting_id}-{i}", "Reg", str(i), None)
+            for i in range(registrants)
+        )
+    return [(SEED_USER, users), (SEED_MEETING, meetings), (SEED_REGISTRANT, registrant_rows)]
+
+
+def webinar_start_storm(events: int, meetings: int = 20, registrants: int = 200):
+    # every meeting starts at once and attendees pile in within seconds
+    per_meeting = max(1, events // meetings)
+    attendees = min(registrants, per_meeting - 1)
+    now = datetime.now(timezone.utc)
+
+    stream = []
+    for n in range(meetings):
+        meeting_id = BASE_MEETING_ID + n
+        stream.append(_envelope("meeting.started", {
+            "id": meeting_id,
+            "uuid": f"uuid-{meeting_id}==",
+            "start_time": _iso(now),
+            "timezone": "UTC",
+        }))
+    for i in range(attendees):
+        for n in range(meetings):
+            meeting_id = BASE_MEETING_ID + n
+            stream.append(_envelope("meeting.participant_joined", {
+                "id": meeting_id,
+                "uuid": f"uuid-{meeting_id}==",
+                "participant": {
+                    "user_id": f"{meeting_id}-{i}",
+                    "participant_uuid": f"p-{meeting_id}-{i}",
+                    "user_name": f"Reg {i}",
+                    "email": f"r{i}@bench.local",
+                    "join_time": _iso(now),
+                },
+            }))
+    return _seed_meetings(meetings, registrants), stream[:events]
+
+
+def meeting_created_wave(events: int):
+    # bulk scheduling through the API; every event cascades into zoom.sync.*
+    stream = [
+        _envelope("meeting.created", {
+            "id": BASE_MEETING_ID + n,
+            "uuid": f"uuid-{BASE_MEETING_ID + n}==",
+            "topic": f"Bench meeting {BASE_MEETING_ID + n}",
+            "type": 2,
+        })
+        for n in range(events)
+    ]
+    return [], stream
+
+
+def recording_burst(events: int, files: int = 6):
+    stream = [
+        _envelope("recording.completed", recording_object(
+            BASE_MEETING_ID + n, f"uuid-{BASE_MEETING_ID + n}==", files
+        ))
+        for n in range(events)
+    ]
+    return _seed_meetings(events, 0, ended=True), stream
+
+
+SCENARIOS: Dict[str, Callable] = {
+    "webinar_start_storm": webinar_start_storm,
+    "meeting_created_wave": meeting_created_wave,
+    "recording_burst": recording_burst,
+}
@@ -0,0 +1,14 @@
+-- stand-in for the ingester-owned table that zoom.event.processed / error_processing update
+CREATE DATABASE IF NOT EXISTS `kopilot_events`;
+
+CREATE TABLE IF NOT EXISTS `kopilot_events`.`raw_events` (
+    `id` BIGINT UNSIGNED PRIMARY KEY,
+    `source` VARCHAR(64) DEFAULT 'zoom',
+    `payload` JSON,
+    `processed` BOOLEAN DEFAULT FALSE,
+    `processed_at` DATETIME(6),
+    `status` VARCHAR(32) DEFAULT 'pending',
+    `error_message` TEXT,
+    `retry_count` INT DEFAULT 0,
+    `date_created` DATETIME(6) DEFAULT CURRENT_TIMESTAMP(6)
+);
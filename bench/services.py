@@ -0,0 +1,145 @@
+import logging
+from pathlib import Path
+from typing import List, Optional
+import getpass
+import os
+import shutil
+import socket
+import subprocess
+import time
+
+logger = logging.getLogger("bench")
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_for_port(port: int, timeout: float = 30, proc: Optional[subprocess.Popen] = None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"{proc.args[0]} exited with code {proc.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"Nothing listening on port {port} after {timeout}s")
+
+class LocalServices:
+
+    def __init__(self, workdir: Path):
+        self.workdir = workdir
+        self.procs: List[subprocess.Popen] = []
+        self.nats_url: Optional[str] = None
+        self.mysql: dict = {}
+
+    def _spawn(self, args: List[str], name: str) -> subprocess.Popen:
+        log = open(self.workdir / f"{name}.log", "wb")
+        proc = subprocess.Popen(args, stdout=log, stderr=subprocess.STDOUT)
+        self.procs.append(proc)
+        return proc
+
+    def start_nats(self) -> str:
+        if os.environ.get("BENCH_NATS_URL"):
+            self.nats_url = os.environ["BENCH_NATS_URL"]
+            return self.nats_url
+
+        binary = shutil.which("nats-server")
+        if not binary:
+            raise RuntimeError("nats-server not found on PATH; install it or set BENCH_NATS_URL")
+
+        port = free_port()
+        store_dir = self.workdir / "jetstream"
+        proc = self._spawn([binary, "-a", "127.0.0.1", "-p", str(port), "-js", "-sd", str(store_dir)], "nats")
+        wait_for_port(port, proc=proc)
+        self.nats_url = f"nats://127.0.0.1:{port}"
+        logger.info(f"Started nats-server at {self.nats_url}")
+        return self.nats_url
+
+    def start_mysql(self) -> dict:
+        if os.environ.get("BENCH_MYSQL_HOST"):
+            self.mysql = {
+                "host": os.environ["BENCH_MYSQL_HOST"],
+                "port": int(os.environ.get("BENCH_MYSQL_PORT", 3306)),
+                "user": os.environ.get("BENCH_MYSQL_USER", "root"),
+                "password": os.environ.get("BENCH_MYSQL_PASSWORD", ""),
+            }
+            return self.mysql
+
+        server = shutil.which("mariadbd") or shutil.which("mysqld")
+        if not server:
+            raise RuntimeError("mariadbd/mysqld not found on PATH; install MariaDB or set BENCH_MYSQL_HOST")
+
+        datadir = self.workdir / "mysql"
+        port = free_port()
+        user = getpass.getuser()
+        install_db = shutil.which("mariadb-install-db") or shutil.which("mysql_install_db")
+        if install_db:
+            subprocess.run(
+                [install_db, "--no-defaults", f"--datadir={datadir}", f"--user={user}",
+                 "--auth-root-authentication-method=normal", "--skip-test-db"],
+                check=True, capture_output=True
+            )
+        else:
+            subprocess.run(
+                [server, "--no-defaults", "--initialize-insecure", f"--datadir={datadir}", f"--user={user}"],
+                check=True, capture_output=True
+            )
+
+        proc = self._spawn([
+            server, "--no-defaults",
+            f"--datadir={datadir}",
+            f"--socket={self.workdir / 'mysql.sock'}",
+            f"--port={port}",
+            "--bind-address=127.0.0.1",
+            f"--user={user}",
+            "--innodb-buffer-pool-size=256M",
+            "--max-connections=500",
+        ], "mysql")
+        wait_for_port(port, timeout=60, proc=proc)
+        self.mysql = {"host": "127.0.0.1", "port": port, "user": "root", "password": ""}
+        logger.info(f"Started {Path(server).name} on port {port}")
+        return self.mysql
+
+    def load_schema(self, base_dir: Path):
+        # needs the environment from configure_env, common.config reads it on import
+        from common.migrations import MigrationRunner, split_sql
+        import mysql.connector
+
+        MigrationRunner(self.mysql, base_dir / "migrations").migrate()
+        con = mysql.connector.connect(**self.mysql)
+        try:
+            cursor = con.cursor()
+            for stmt in split_sql((base_dir / "bench" / "schema.sql").read_text()):
+                cursor.execute(stmt)
+            con.commit()
+            cursor.close()
+        finally:
+            con.close()
+
+    def reset(self, tables: List[str]):
+        import mysql.connector
+
+        con = mysql.connector.connect(**self.mysql)
+        try:
+            cursor = con.cursor()
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 0;")
+            for table in tables:
+                cursor.execute(f"TRUNCATE TABLE {table};")
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 1;")
+            con.commit()
+            cursor.close()
+        finally:
+            con.close()
+
+    def stop(self):
+        for proc in reversed(self.procs):
+            if proc.poll() is None:
+                proc.terminate()
+                try:
+                    proc.wait(timeout=15)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+        self.procs.clear()
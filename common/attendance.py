@@ -0,0 +1,356 @@
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, List
+import asyncio
+import contextvars
+import json
+import time
+
+from common.config import ATTENDANCE_CFG
+from common.mysql import MySQL as db
+
+import anyio
+
+logger = logging.getLogger()
+
+# deltas are added on upsert so re-flushing never rewinds minutes; the start of a
+# session still open is stored in open_since so a leave seen after a restart can time it
+ATTENDANCE_UPSERT_SQL = """
+INSERT INTO `kopilot_zoom`.`attendance` (
+    `meeting_id`,
+    `meeting_uuid`,
+    `participant_key`,
+    `email`,
+    `name`,
+    `first_join_time`,
+    `last_leave_time`,
+    `seconds_attended`,
+    `join_count`,
+    `is_present`,
+    `open_since`,
+    `timeline`
+) VALUES (
+    %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+)
+ON DUPLICATE KEY UPDATE
+    `timeline` = IF(
+        JSON_LENGTH(COALESCE(`timeline`, JSON_ARRAY())) >= 500,
+        `timeline`,
+        JSON_MERGE_PRESERVE(COALESCE(`timeline`, JSON_ARRAY()), VALUES(`timeline`))
+    ),
+    `email` = COALESCE(VALUES(`email`), `email`),
+    `name` = COALESCE(VALUES(`name`), `name`),
+    `first_join_time` = COALESCE(LEAST(`first_join_time`, VALUES(`first_join_time`)), `first_join_time`, VALUES(`first_join_time`)),
+    `last_leave_time` = COALESCE(GREATEST(`last_leave_time`, VALUES(`last_leave_time`)), `last_leave_time`, VALUES(`last_leave_time`)),
+    `seconds_attended` = `seconds_attended` + VALUES(`seconds_attended`),
+    `join_count` = `join_count` + VALUES(`join_count`),
+    `is_present` = VALUES(`is_present`),
+    `open_since` = VALUES(`open_since`);
+"""
+
+# a leave for a session opened before this process started; runs before the upsert
+RESUME_LEAVE_SQL = """
+UPDATE `kopilot_zoom`.`attendance`
+SET
+    `seconds_attended` = `seconds_attended` + GREATEST(0, TIMESTAMPDIFF(SECOND, `open_since`, %s)),
+    `last_leave_time` = GREATEST(COALESCE(`last_leave_time`, %s), %s),
+    `is_present` = FALSE,
+    `open_since` = NULL
+WHERE `meeting_uuid` = %s AND `participant_key` = %s AND `open_since` IS NOT NULL;
+"""
+
+# meeting ended: close whatever is still open in the table, e.g. sessions from before a restart
+CLOSE_OPEN_SQL = """
+UPDATE `kopilot_zoom`.`attendance`
+SET
+    `seconds_attended` = `seconds_attended` + GREATEST(0, TIMESTAMPDIFF(SECOND, `open_since`, %s)),
+    `last_leave_time` = GREATEST(COALESCE(`last_leave_time`, %s), %s),
+    `is_present` = FALSE,
+    `open_since` = NULL
+WHERE `meeting_uuid` = %s AND `open_since` IS NOT NULL;
+"""
+
+PARTICIPATED_SQL = """
+UPDATE `kopilot_zoom`.`registrant`
+    SET `participated` = TRUE
+WHERE `meeting_id` = %s AND `email` = %s;
+"""
+
+def parse_time(value) -> float:
+    if not value:
+        return time.time()
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return time.time()
+
+def to_datetime(ts: Optional[float]):
+    return datetime.fromtimestamp(ts, timezone.utc) if ts else None
+
+
+class Participant:
+    __slots__ = ("email", "name", "first_join", "last_leave", "active", "open_since", "seconds", "joins", "segments", "resume_at", "dirty")
+
+    def __init__(self, email: Optional[str], name: Optional[str]):
+        self.email = email
+        self.name = name
+        self.first_join: Optional[float] = None
+        self.last_leave: Optional[float] = None
+        self.active = 0            # open sessions; one person can join from two devices
+        self.open_since: Optional[float] = None
+        self.seconds = 0.0         # closed seconds not yet flushed
+        self.joins = 0             # joins not yet flushed
+        self.segments: Optional[List[List[int]]] = None
+        self.resume_at: Optional[float] = None   # leave of a session we never saw open
+        self.dirty = False
+
+
+class MeetingAttendance:
+    __slots__ = ("meeting_id", "meeting_uuid", "participants", "new_emails", "last_activity", "dropped")
+
+    def __init__(self, meeting_id, meeting_uuid: str):
+        self.meeting_id = meeting_id
+        self.meeting_uuid = meeting_uuid
+        self.participants: Dict[str, Participant] = {}
+        self.new_emails: List[str] = []
+        self.last_activity = time.monotonic()
+        self.dropped = 0
+
+
+class AttendanceAggregator:
+
+    def __init__(self, flush_interval: int, max_meetings: int, max_participants: int, max_segments: int, idle_seconds: int):
+        self.flush_interval = flush_interval
+        self.max_meetings = max_meetings
+        self.max_participants = max_participants
+        self.max_segments = max_segments
+        self.idle_seconds = idle_seconds
+
+        self._meetings: Dict[str, MeetingAttendance] = {}
+        self._closing: List[MeetingAttendance] = []
+        # CLOSE_OPEN_SQL params of ended meetings, run only after their deltas are written
+        self._ended: List[tuple] = []
+        self._lock = anyio.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+
+        self.rows_written = 0
+        self.flush_failures = 0
+
+    @staticmethod
+    def participant_key(participant: Dict[str, Any]) -> Optional[str]:
+        # user_id changes on every rejoin, so prefer identifiers stable for the meeting
+        key = participant.get("email") or participant.get("participant_uuid") or participant.get("user_id") or participant.get("id")
+        return str(key).lower() if key else None
+
+    def _meeting(self, meeting_id, meeting_uuid) -> MeetingAttendance:
+        meeting_uuid = meeting_uuid or str(meeting_id)
+        meeting = self._meetings.get(meeting_uuid)
+        if meeting is None:
+            if len(self._meetings) >= self.max_meetings:
+                oldest = min(self._meetings.values(), key=lambda m: m.last_activity)
+                logger.warning(f"Attendance tracking limit reached, closing {oldest.meeting_uuid}")
+                self._close(oldest, time.time())
+            meeting = self._meetings[meeting_uuid] = MeetingAttendance(meeting_id, meeting_uuid)
+            self._start_flusher()
+        meeting.last_activity = time.monotonic()
+        return meeting
+
+    def _participant(self, meeting: MeetingAttendance, participant: Dict[str, Any]) -> Optional[Participant]:
+        key = self.participant_key(participant)
+        if key is None:
+            return None
+        state = meeting.participants.get(key)
+        if state is None:
+            if len(meeting.participants) >= self.max_participants:
+                if not meeting.dropped:
+                    logger.warning(f"Meeting {meeting.meeting_uuid} exceeded {self.max_participants} tracked participants")
+                meeting.dropped += 1
+                return None
+            state = meeting.participants[key] = Participant(participant.get("email"), participant.get("user_name"))
+        return state
+
+    def join(self, meeting_id, meeting_uuid, participant: Dict[str, Any]):
+        meeting = self._meeting(meeting_id, meeting_uuid)
+        state = self._participant(meeting, participant)
+        if state is None:
+            return
+
+        joined_at = parse_time(participant.get("join_time"))
+        if state.first_join is None:
+            if state.email:
+                meeting.new_emails.append(state.email)
+        if state.first_join is None or joined_at < state.first_join:
+            state.first_join = joined_at
+        if state.active == 0:
+            state.open_since = joined_at
+        state.active += 1
+        state.joins += 1
+        state.dirty = True
+
+    def leave(self, meeting_id, meeting_uuid, participant: Dict[str, Any]):
+        meeting = self._meeting(meeting_id, meeting_uuid)
+        state = self._participant(meeting, participant)
+        if state is None:
+            return
+        self._leave(state, parse_time(participant.get("leave_time")))
+
+    def _leave(self, state: Participant, left_at: float):
+        if state.active == 0:
+            # leave without a join we saw (restart, dropped webhook): timed against the
+            # stored open_since at flush. With two devices the first such leave closes it.
+            state.resume_at = max(state.resume_at or left_at, left_at)
+            state.last_leave = max(state.last_leave or left_at, left_at)
+            state.dirty = True
+            return
+
+        state.active -= 1
+        if state.active == 0 and state.open_since is not None:
+            opened = state.open_since
+            state.seconds += max(0.0, left_at - opened)
+            if state.segments is None:
+                state.segments = []
+            if len(state.segments) < self.max_segments:
+                state.segments.append([int(opened), int(left_at)])
+            state.open_since = None
+        state.last_leave = max(state.last_leave or left_at, left_at)
+        state.dirty = True
+
+    def _close(self, meeting: MeetingAttendance, ended_at: float):
+        for state in meeting.participants.values():
+            while state.active:
+                self._leave(state, ended_at)
+        self._meetings.pop(meeting.meeting_uuid, None)
+        self._closing.append(meeting)
+
+    async def end(self, meeting_id, meeting_uuid, end_time=None):
+        ended_at = parse_time(end_time)
+        meeting = self._meetings.get(meeting_uuid or str(meeting_id))
+        if meeting is not None:
+            self._close(meeting, ended_at)
+        if meeting_uuid:
+            ended = to_datetime(ended_at)
+            self._ended.append((ended, ended, ended, meeting_uuid))
+        if not await self.flush():
+            # the rows are closed by the flush loop once the retained deltas are written
+            self._start_flusher()
+
+    def _collect(self, meeting: MeetingAttendance, rows: list, resumes: list, taken: list):
+        for key, state in meeting.participants.items():
+            if not state.dirty:
+                continue
+            if state.resume_at is not None:
+                left = to_datetime(state.resume_at)
+                resumes.append((left, left, left, meeting.meeting_uuid, key))
+            rows.append((
+                meeting.meeting_id,
+                meeting.meeting_uuid,
+                key,
+                state.email,
+                state.name,
+                to_datetime(state.first_join),
+                to_datetime(state.last_leave),
+                int(state.seconds),
+                state.joins,
+                state.active > 0,
+                to_datetime(state.open_since) if state.active else None,
+                json.dumps(state.segments or []),
+            ))
+            taken.append((state, state.seconds, state.joins, state.segments, state.resume_at))
+            state.seconds, state.joins, state.segments, state.resume_at, state.dirty = 0.0, 0, None, None, False
+
+    async def flush(self) -> bool:
+        async with self._lock:
+            rows, resumes, taken, participated, new_emails = [], [], [], [], []
+            closing, self._closing = self._closing, []
+            ended, self._ended = self._ended, []
+            for meeting in list(self._meetings.values()) + closing:
+                self._collect(meeting, rows, resumes, taken)
+                if meeting.new_emails:
+                    participated.extend((meeting.meeting_id, email) for email in meeting.new_emails)
+                    new_emails.append((meeting, meeting.new_emails))
+                    meeting.new_emails = []
+
+            idle_before = time.monotonic() - self.idle_seconds
+            for meeting in list(self._meetings.values()):
+                if meeting.last_activity < idle_before:
+                    logger.info(f"Dropping idle attendance state for {meeting.meeting_uuid}")
+                    self._close(meeting, time.time())
+
+            if not rows and not participated and not ended:
+                return True
+            try:
+                if resumes:
+                    await db.aexecute_many(RESUME_LEAVE_SQL, resumes)
+                    resumes = []
+                if rows:
+                    await db.aexecute_many(ATTENDANCE_UPSERT_SQL, rows)
+                if participated:
+                    await db.aexecute_many(PARTICIPATED_SQL, participated)
+                self.rows_written += len(rows)
+                if rows or participated:
+                    logger.info(f"Flushed {len(rows)} attendance rows, {len(participated)} participants.")
+            except Exception as e:
+                # put the deltas back so the next flush retries them
+                self.flush_failures += 1
+                logger.error(f"Failed to flush attendance: {e}")
+                for state, seconds, joins, segments, resume_at in taken:
+                    state.seconds += seconds
+                    state.joins += joins
+                    if segments:
+                        state.segments = segments + (state.segments or [])
+                    if resume_at is not None and resumes:
+                        # only when the resume statement itself did not run
+                        state.resume_at = max(state.resume_at or resume_at, resume_at)
+                    state.dirty = True
+                for meeting, emails in new_emails:
+                    meeting.new_emails = emails + meeting.new_emails
+                self._closing.extend(closing)
+                self._ended = ended + self._ended
+                return False
+
+            if ended:
+                try:
+                    # closing rows still open in the DB before their deltas are written would count them twice
+                    await db.aexecute_many(CLOSE_OPEN_SQL, ended)
+                except Exception as e:
+                    self.flush_failures += 1
+                    logger.error(f"Failed to close attendance of {len(ended)} ended meetings: {e}")
+                    self._ended = ended + self._ended
+                    return False
+            return True
+
+    def _start_flusher(self):
+        if self._flusher is None or self._flusher.done():
+            # fresh context, flushes are not part of the webhook that happened to start the loop
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_loop(), context=contextvars.Context())
+
+    async def _flush_loop(self):
+        while self._meetings or self._closing or self._ended:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.exception(f"Attendance flush loop error: {e}")
+
+    async def close(self):
+        await self.flush()
+        # nothing may flush after the pool is closed, it would quietly open a new one
+        if self._flusher is not None and not self._flusher.done():
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+        self._flusher = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "meetings": len(self._meetings),
+            "participants": sum(len(m.participants) for m in self._meetings.values()),
+            "present": sum(1 for m in self._meetings.values() for p in m.participants.values() if p.active),
+            "dropped": sum(m.dropped for m in self._meetings.values()),
+            "rows_written": self.rows_written,
+            "flush_failures": self.flush_failures,
+        }
+
+attendance = AttendanceAggregator(**ATTENDANCE_CFG)
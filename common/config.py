@@ -11,12 +11,30 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 MYSQL_CFG = {
     'host': os.environ.get("MYSQL_HOST"),
+    'port': int(os.environ.get("MYSQL_PORT", 3306)),
     'user': os.environ.get("MYSQL_USER"),
     'password': os.environ.get("MYSQL_PASSWORD"),
     'database': os.environ.get("MYSQL_DATABASE"),
-    'pool_size': 5,
 }
 
+MYSQL_POOL_CFG = {
+    'size': int(os.environ.get("MYSQL_POOL_SIZE", 5)),
+    'max_overflow': int(os.environ.get("MYSQL_POOL_MAX_OVERFLOW", 10)),
+    'timeout': float(os.environ.get("MYSQL_POOL_TIMEOUT", 10)),   # seconds to wait for a connection
+    'recycle': int(os.environ.get("MYSQL_POOL_RECYCLE", 1800)),   # reconnect connections older than this
+    'ping_after': int(os.environ.get("MYSQL_POOL_PING_AFTER", 30)),  # ping connections idle longer than this
+}
+
+SERVICE_ROLE = os.environ.get("SERVICE_ROLE", "all")
+SERVICE_ROLES = {
+    'events': ['service', 'event', 'recording'],
+    'sync': ['service', 'sync', 'reconcile', 'archive'],
+}
+# optional comma separated subject patterns (fnmatch) to narrow a role further
+SERVICE_SUBJECTS = [s.strip() for s in os.environ.get("SERVICE_SUBJECTS", "").split(",") if s.strip()]
+
+SHUTDOWN_TIMEOUT = float(os.environ.get("SHUTDOWN_TIMEOUT", 25))
+
 NATS_CFG = {
     'servers': os.environ.get("NATS_URL"),
     'name': 'kopilot_zoom',
@@ -24,9 +42,80 @@ NATS_CFG = {
     'max_reconnect_attempts': 10
 }
 
+NATS_PUBLISH_CFG = {
+    'queue_size': int(os.environ.get("NATS_PUBLISH_QUEUE_SIZE", 10_000)),
+    'batch_size': 256,
+    'retry_size': int(os.environ.get("NATS_PUBLISH_RETRY_SIZE", 1_000)),  # held while disconnected
+}
+
+DEDUPE_CFG = {
+    'window_seconds': int(os.environ.get("DEDUPE_WINDOW_SECONDS", 6*60*60)),
+    'max_keys': int(os.environ.get("DEDUPE_MAX_KEYS", 200_000)),
+    'persist_path': os.environ.get("DEDUPE_PATH"),
+    'flush_seconds': float(os.environ.get("DEDUPE_FLUSH_SECONDS", 1)),
+}
+
+RECORDING_CFG = {
+    'fetch_missing': os.environ.get("RECORDING_FETCH_MISSING", "true").lower() == "true",
+    'batch_size': 100,
+    'concurrency': 4,
+}
+
+ATTENDANCE_CFG = {
+    'flush_interval': int(os.environ.get("ATTENDANCE_FLUSH_INTERVAL", 30)),
+    'max_meetings': 200,
+    'max_participants': 5000,   # per meeting
+    'max_segments': 50,         # join/leave pairs kept per participant between flushes
+    'idle_seconds': 12*60*60,
+}
+
+RECONCILE_CFG = {
+    'enabled': os.environ.get("RECONCILE", "true").lower() == "true",
+    'interval': int(os.environ.get("RECONCILE_INTERVAL", 15*60)),
+    'call_budget': int(os.environ.get("RECONCILE_CALL_BUDGET", 60)),   # zoom calls queued per run
+    'cooldown': 6*60*60,            # seconds before the same meeting is checked again
+    'lookback_hours': 48,
+    'start_grace_minutes': 30,      # scheduled start passed by this much with no meeting.started
+    'recording_grace_minutes': 90,  # ended this long ago with no recording.completed
+    'recording_lookback_hours': 24,
+}
+
+ARCHIVE_CFG = {
+    # off until the job has been run against a real server, it deletes hot rows
+    'enabled': os.environ.get("ARCHIVE", "false").lower() == "true",
+    'interval': int(os.environ.get("ARCHIVE_INTERVAL", 6*60*60)),
+    'after_days': int(os.environ.get("ARCHIVE_AFTER_DAYS", 120)),   # by scheduled start_time
+    'chunk_size': 200,          # meetings moved per transaction
+    'max_chunks': 50,           # per run, the rest waits for the next one
+    'pause': 0.5,               # seconds between chunks, leaves room for webhook writes
+    'export_dir': os.environ.get("ARCHIVE_EXPORT_DIR"),  # also write moved rows as gzipped JSONL
+}
+
+DIAGNOSTICS_CFG = {
+    'enabled': os.environ.get("DIAGNOSTICS", "true").lower() == "true",
+    'asyncio_debug': os.environ.get("DIAGNOSTICS_ASYNCIO_DEBUG", "false").lower() == "true",  # costly, opt in
+    'slow_callback_ms': int(os.environ.get("DIAGNOSTICS_SLOW_CALLBACK_MS", 100)),
+    'slow_handler_ms': int(os.environ.get("DIAGNOSTICS_SLOW_HANDLER_MS", 2000)),
+    'profile_dir': os.environ.get("DIAGNOSTICS_PROFILE_DIR", os.environ.get("LOG_PATH", "/tmp/")),
+    'profile_hz': 100,
+    'profile_seconds': 10,
+}
+
 ZOOM_CLIENT_ID = os.environ.get("ZOOM_CLIENT_ID")
 ZOOM_CLIENT_SECRET = os.environ.get("ZOOM_CLIENT_SECRET")
 ZOOM_ACCOUNT_ID = os.environ.get("ZOOM_ACCOUNT_ID")
+ZOOM_API_URL = os.environ.get("ZOOM_API_URL", "https://api.zoom.us/v2/")
+ZOOM_AUTH_URL = os.environ.get("ZOOM_AUTH_URL", "https://zoom.us/oauth/token")
+
+ZOOM_TOKEN_CFG = {
+    'store': os.environ.get("ZOOM_TOKEN_STORE", "memory"),  # memory | file | nats
+    'file_path': os.environ.get("ZOOM_TOKEN_FILE", "/tmp/kopilot_zoom_token.json"),
+    'kv_bucket': os.environ.get("ZOOM_TOKEN_KV_BUCKET", "kopilot_zoom"),
+    'kv_key': 'zoom_access_token',
+    'buffer_seconds': 300,
+    'refresh_margin': 120,
+    'retry_seconds': 10,
+}
 
 LOGGING_CFG = {
     'version': 1,
@@ -53,6 +142,7 @@ LOGGING_CFG = {
             'encoding': 'utf-8',
             'maxBytes': 10*1024*1024,
             'backupCount': 5,
+            'delay': True,
         },
         'mysql_file': {
             'level': 'INFO',
@@ -62,6 +152,7 @@ LOGGING_CFG = {
             'encoding': 'utf-8',
             'maxBytes': 10*1024*1024,
             'backupCount': 5,
+            'delay': True,
         },
         'zoom_file': {
             'level': 'INFO',
@@ -71,6 +162,7 @@ LOGGING_CFG = {
             'encoding': 'utf-8',
             'maxBytes': 10*1024*1024,
             'backupCount': 5,
+            'delay': True,
         },
         'nats_file': {
             'level': 'INFO',
@@ -80,6 +172,7 @@ LOGGING_CFG = {
             'encoding': 'utf-8',
             'maxBytes': 10*1024*1024,
             'backupCount': 5,
+            'delay': True,
         },
     },
     'loggers': {
@@ -0,0 +1,168 @@
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+import os
+import time
+
+from common.config import DEDUPE_CFG
+
+from anyio import Lock, to_thread
+
+logger = logging.getLogger()
+
+class EventDeduper:
+
+    def __init__(self, window_seconds: int, max_keys: int, persist_path: Optional[str] = None, flush_seconds: float = 1):
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self.persist_path = persist_path
+        self.flush_seconds = flush_seconds
+
+        # key -> expiry; keys share one window so insertion order is expiry order
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+        self._file = None
+        self._pending: List[str] = []
+        self._flush_lock = Lock()
+        self._written = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    @staticmethod
+    def keys_for(event_id, event_data: Dict[str, Any]) -> List[str]:
+        keys = [f"id:{event_id}"]
+
+        event_type = event_data.get("event")
+        event_ts = event_data.get("event_ts")
+        object = event_data.get("payload", {}).get("object", {})
+        object_id = object.get("uuid") or object.get("id")
+        if event_type and event_ts and object_id:
+            # participant and registrant events share the meeting's object id
+            child = object.get("participant") or object.get("registrant") or {}
+            child_id = child.get("participant_uuid") or child.get("user_id") or child.get("id") or child.get("email") or ""
+            keys.append(f"ev:{event_type}:{object_id}:{child_id}:{event_ts}")
+        return keys
+
+    def _prune(self, now: float):
+        while self._seen:
+            key, expires_at = next(iter(self._seen.items()))
+            if expires_at > now and len(self._seen) <= self.max_keys:
+                break
+            self._seen.popitem(last=False)
+            if expires_at > now:
+                self.evicted += 1
+
+    def claim(self, keys: Iterable[str]) -> bool:
+        now = time.time()
+        self._prune(now)
+
+        keys = list(keys)
+        if any(key in self._seen for key in keys):
+            self.hits += 1
+            return False
+
+        expires_at = now + self.window_seconds
+        for key in keys:
+            self._seen[key] = expires_at
+            self._write(f"{key}\t{expires_at}\n")
+        self.misses += 1
+        return True
+
+    def release(self, keys: Iterable[str]):
+        for key in keys:
+            if self._seen.pop(key, None) is not None:
+                self._write(f"{key}\t0\n")
+
+    def _write(self, line: str):
+        # claim() stays free of I/O; flush() appends the buffered lines from a thread
+        if self._file is not None:
+            self._pending.append(line)
+
+    async def flush(self):
+        async with self._flush_lock:
+            if self._file is None or not self._pending:
+                return
+            lines, self._pending = self._pending, []
+            try:
+                if self._written + len(lines) > 2 * self.max_keys:
+                    # the snapshot already holds every buffered key
+                    await to_thread.run_sync(self._compact, list(self._seen.items()))
+                else:
+                    await to_thread.run_sync(self._append, lines)
+            except OSError as e:
+                logger.error(f"Failed to persist dedupe keys, continuing in memory only: {e}")
+                self._close_file()
+
+    def _append(self, lines: List[str]):
+        self._file.writelines(lines)
+        self._file.flush()
+        self._written += len(lines)
+
+    def _compact(self, entries: List[Tuple[str, float]]):
+        self._close_file()
+        tmp_path = f"{self.persist_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(f"{key}\t{expires_at}\n" for key, expires_at in entries)
+        os.replace(tmp_path, self.persist_path)
+        self._file = open(self.persist_path, 'a', encoding='utf-8')
+        self._written = len(entries)
+
+    def _read(self) -> Dict[str, float]:
+        entries: Dict[str, float] = {}
+        try:
+            with open(self.persist_path, encoding='utf-8') as f:
+                for line in f:
+                    key, _, expires_at = line.rstrip("\n").rpartition("\t")
+                    try:
+                        entries[key] = float(expires_at)
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Failed to load dedupe index from {self.persist_path}: {e}")
+        return entries
+
+    async def load(self):
+        # runs once at startup, before zoom.event is subscribed
+        if not self.persist_path:
+            return
+
+        entries = await to_thread.run_sync(self._read)
+        now = time.time()
+        live = sorted(
+            ((expires_at, key) for key, expires_at in entries.items() if expires_at > now)
+        )[-self.max_keys:]
+        for expires_at, key in live:
+            self._seen[key] = expires_at
+
+        try:
+            await to_thread.run_sync(self._compact, list(self._seen.items()))
+        except OSError as e:
+            logger.error(f"Dedupe persistence disabled, cannot write {self.persist_path}: {e}")
+            self._close_file()
+            return
+        logger.info(f"Loaded {len(live)} dedupe keys from {self.persist_path}")
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    async def close(self):
+        await self.flush()
+        self._close_file()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "keys": len(self._seen),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evicted": self.evicted,
+            "unflushed": len(self._pending),
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+deduper = EventDeduper(**DEDUPE_CFG)
@@ -0,0 +1,217 @@
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Optional
+import asyncio
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+
+from common.config import DIAGNOSTICS_CFG
+
+logger = logging.getLogger()
+
+# span name -> seconds for the handler currently running in this context
+_current: ContextVar[Optional[Dict[str, float]]] = ContextVar("diagnostics_trace", default=None)
+
+@contextmanager
+def span(name: str):
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace[name] = trace.get(name, 0.0) + time.perf_counter() - started
+
+
+class HandlerStats:
+    __slots__ = ("count", "total", "max", "slow", "spans")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.slow = 0
+        self.spans: Dict[str, float] = {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+            "slow": self.slow,
+            "span_avg_ms": {
+                name: round(seconds / self.count * 1000, 3) for name, seconds in self.spans.items()
+            } if self.count else {},
+        }
+
+
+class Diagnostics:
+
+    def __init__(self, enabled: bool, asyncio_debug: bool, slow_callback_ms: int, slow_handler_ms: int, profile_dir: str, profile_hz: int, profile_seconds: int):
+        self.enabled = enabled
+        self.asyncio_debug = asyncio_debug
+        self.slow_callback = slow_callback_ms / 1000
+        self.slow_handler = slow_handler_ms / 1000
+        self.profile_dir = profile_dir
+        self.profile_hz = profile_hz
+        self.profile_seconds = profile_seconds
+
+        self.handlers: Dict[str, HandlerStats] = {}
+        self.loop_stalls = 0
+        self.loop_stall_max = 0.0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat = time.monotonic()
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._profiling = threading.Lock()
+
+    @contextmanager
+    def trace(self, subject: str):
+        if not self.enabled:
+            yield
+            return
+        trace: Dict[str, float] = {}
+        token = _current.set(trace)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            _current.reset(token)
+            self._record(subject, elapsed, trace)
+
+    def _record(self, subject: str, elapsed: float, trace: Dict[str, float]):
+        stats = self.handlers.get(subject)
+        if stats is None:
+            stats = self.handlers[subject] = HandlerStats()
+        stats.count += 1
+        stats.total += elapsed
+        stats.max = max(stats.max, elapsed)
+        for name, seconds in trace.items():
+            stats.spans[name] = stats.spans.get(name, 0.0) + seconds
+
+        if elapsed >= self.slow_handler:
+            stats.slow += 1
+            accounted = sum(trace.values())
+            breakdown = ", ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in sorted(trace.items()))
+            logger.warning(
+                f"Slow handler {subject}: {elapsed * 1000:.0f}ms "
+                f"({breakdown or 'no spans'}, other={max(0.0, elapsed - accounted) * 1000:.0f}ms)"
+            )
+
+    def install(self, loop: asyncio.AbstractEventLoop):
+        if not self.enabled:
+            return
+        self._loop = loop
+        self._loop_thread_id = threading.get_ident()
+
+        loop.slow_callback_duration = self.slow_callback
+        if self.asyncio_debug:
+            loop.set_debug(True)
+
+        self._heartbeat_task = loop.create_task(self._beat())
+        self._stop.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+        try:
+            loop.add_signal_handler(signal.SIGUSR1, self.request_profile)
+        except (NotImplementedError, RuntimeError):
+            pass
+        logger.info(f"Diagnostics enabled (stall threshold {self.slow_callback * 1000:.0f}ms, SIGUSR1 dumps a profile)")
+
+    async def uninstall(self):
+        self._stop.set()
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+
+    async def _beat(self):
+        interval = self.slow_callback / 2
+        while True:
+            self._heartbeat = time.monotonic()
+            await asyncio.sleep(interval)
+
+    def _watch(self):
+        # a thread, so the stack is captured while the loop is still blocked
+        interval = self.slow_callback / 2
+        reported = None
+        while not self._stop.wait(interval):
+            beat = self._heartbeat
+            stalled = time.monotonic() - beat - interval
+            if stalled < self.slow_callback:
+                continue
+            if reported == beat:
+                continue
+            reported = beat
+            self.loop_stalls += 1
+            self.loop_stall_max = max(self.loop_stall_max, stalled)
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame, limit=12)) if frame else "unavailable"
+            logger.warning(f"Event loop blocked for {stalled * 1000:.0f}ms+, loop thread stack:\n{stack}")
+
+    def request_profile(self, seconds: Optional[float] = None, hz: Optional[int] = None):
+        if not self._profiling.acquire(blocking=False):
+            logger.info("Profile already running")
+            return
+        thread = threading.Thread(
+            target=self._profile,
+            args=(seconds or self.profile_seconds, hz or self.profile_hz),
+            name="sampling-profiler",
+            daemon=True,
+        )
+        thread.start()
+
+    def _profile(self, seconds: float, hz: int):
+        try:
+            samples: Counter = Counter()
+            interval = 1 / hz
+            deadline = time.monotonic() + seconds
+            own = threading.get_ident()
+            while time.monotonic() < deadline:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                        frame = frame.f_back
+                    thread = "loop" if thread_id == self._loop_thread_id else f"thread-{thread_id}"
+                    samples[";".join([thread, *reversed(stack)])] += 1
+                time.sleep(interval)
+
+            # collapsed-stack format, ready for flamegraph.pl / speedscope
+            path = os.path.join(self.profile_dir, f"profile-{os.getpid()}-{int(time.time())}.folded")
+            with open(path, "w", encoding="utf-8") as f:
+                f.writelines(f"{stack} {count}\n" for stack, count in samples.most_common())
+            logger.info(f"Wrote {sum(samples.values())} samples over {seconds}s to {path}")
+        except Exception as e:
+            logger.exception(f"Profiling failed: {e}")
+        finally:
+            self._profiling.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "loop_stalls": self.loop_stalls,
+            "loop_stall_max_ms": round(self.loop_stall_max * 1000, 1),
+            "handlers": {subject: stats.to_dict() for subject, stats in self.handlers.items()},
+        }
+
+diagnostics = Diagnostics(**DIAGNOSTICS_CFG)
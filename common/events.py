@@ -0,0 +1,205 @@
+import logging
+from collections import Counter
+from typing import Dict, Any, Optional, Callable, Union, List, Awaitable
+import asyncio
+import contextvars
+import time
+
+from common.mysql import MySQL as db
+from common.nats_server import nc
+
+import anyio
+
+logger = logging.getLogger()
+
+# called once a deferred row is written (None) or has failed (the error)
+Ack = Callable[[Optional[Exception]], Awaitable[None]]
+
+class Batch:
+    __slots__ = ("size", "interval")
+
+    def __init__(self, size: int = 100, interval: float = 1.0):
+        self.size = size
+        self.interval = interval
+
+
+class BatchWriter:
+
+    def __init__(self, query: str, batch: Batch):
+        self.query = query
+        self.batch = batch
+        self._rows: List[tuple] = []   # (params, ack, headers of the event that added it)
+        self._lock = anyio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+
+        self.flushes = 0
+        self.rows_written = 0
+        self.rows_failed = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._rows)
+
+    async def add(self, params: tuple, ack: Ack):
+        self._rows.append((params, ack, nc.current_headers()))
+        if len(self._rows) >= self.batch.size:
+            await self.flush()
+        elif self._timer is None or self._timer.done():
+            # a fresh context: the timer must not carry the headers or trace of the handler that started it
+            self._timer = asyncio.get_running_loop().create_task(self._flush_later(), context=contextvars.Context())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.batch.interval)
+        await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            rows, self._rows = self._rows, []
+            if not rows:
+                return
+            try:
+                await db.aexecute_many(self.query, [params for params, _, _ in rows])
+                results = [None] * len(rows)
+            except Exception as e:
+                # find the rows that actually fail instead of failing the whole batch
+                logger.error(f"Failed to flush {len(rows)} batched rows, retrying one by one: {e}")
+                results = []
+                for params, _, _ in rows:
+                    try:
+                        await db.aexecute_update(self.query, params)
+                        results.append(None)
+                    except Exception as row_error:
+                        results.append(row_error)
+            self.flushes += 1
+
+            for (_, ack, headers), error in zip(rows, results):
+                if error is None:
+                    self.rows_written += 1
+                else:
+                    self.rows_failed += 1
+                try:
+                    with nc.using_headers(headers):
+                        await ack(error)
+                except Exception as e:
+                    logger.error(f"Batched row acknowledgement failed: {e}")
+
+
+    async def close(self):
+        # final flush first: it waits out a timer flush already holding the lock
+        await self.flush()
+        if self._timer is not None and not self._timer.done():
+            self._timer.cancel()
+            try:
+                await self._timer
+            except asyncio.CancelledError:
+                pass
+        self._timer = None
+
+
+class EventType:
+    __slots__ = ("name", "handler", "getters", "query", "writer", "count", "errors", "total_time", "max_time")
+
+    def __init__(self, name: str, handler: Callable, columns: Dict[str, Union[str, Callable]], query: Optional[str], batch: Optional[Batch]):
+        self.name = name
+        self.handler = handler
+        self.getters = [(column, self._compile(source)) for column, source in columns.items()]
+        self.query = query
+        self.writer = BatchWriter(query, batch) if (query and batch) else None
+
+        self.count = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    @staticmethod
+    def _compile(source: Union[str, Callable]) -> Callable:
+        if callable(source):
+            return source
+        path = tuple(source.split("."))
+        if len(path) == 1:
+            key = path[0]
+            return lambda object: object.get(key)
+
+        def getter(object):
+            for key in path:
+                object = (object or {}).get(key)
+            return object
+        return getter
+
+    def extract(self, object: Dict[str, Any]) -> Dict[str, Any]:
+        return {column: getter(object) for column, getter in self.getters}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.total_time / self.count * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.max_time * 1000, 3),
+            "pending": self.writer.pending if self.writer else 0,
+        }
+
+
+class EventRegistry:
+
+    def __init__(self):
+        self._types: Dict[str, EventType] = {}
+        self.skipped: Counter = Counter()
+
+    def on(
+        self,
+        *event_types: str,
+        columns: Optional[Dict[str, Union[str, Callable]]] = None,
+        query: Optional[str] = None,
+        batch: Optional[Batch] = None,
+    ):
+        def decorator(func: Callable):
+            for event_type in event_types:
+                if event_type in self._types:
+                    raise ValueError(f"Duplicate handler for {event_type}")
+                self._types[event_type] = EventType(event_type, func, columns or {}, query, batch)
+            return func
+        return decorator
+
+    def get(self, event_type: Optional[str]) -> Optional[EventType]:
+        spec = self._types.get(event_type)
+        if spec is None:
+            self.skipped[event_type] += 1
+        return spec
+
+    async def dispatch(self, spec: EventType, object: Dict[str, Any], ack: Ack) -> bool:
+        # returns True when the write was deferred to a batch; ack then runs after the flush
+        started = time.perf_counter()
+        try:
+            params = await spec.handler(spec.extract(object), object)
+            if params is not None and spec.query:
+                if spec.writer:
+                    await spec.writer.add(params, ack)
+                    return True
+                await db.aexecute_update(spec.query, params)
+            return False
+        except Exception:
+            spec.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            spec.count += 1
+            spec.total_time += elapsed
+            spec.max_time = max(spec.max_time, elapsed)
+
+    async def flush(self):
+        for spec in self._types.values():
+            if spec.writer:
+                await spec.writer.flush()
+
+    async def close(self):
+        for spec in self._types.values():
+            if spec.writer:
+                await spec.writer.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "types": {name: spec.stats() for name, spec in self._types.items() if spec.count},
+            "skipped": dict(self.skipped),
+        }
+
+registry = EventRegistry()
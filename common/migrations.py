@@ -0,0 +1,317 @@
+# Versioned schema migrations for kopilot_zoom.
+#
+#   python -m common.migrations status
+#   python -m common.migrations migrate [--to VERSION] [--dry-run]
+#   python -m common.migrations baseline [VERSION]   # mark hand-applied migrations as done
+#   python -m common.migrations explain [--allow-inconclusive]   # EXPLAIN every handler query
+#
+# migrations/NNNN_name.sql files are applied in order and recorded with their checksum
+# in schema_migrations. MySQL commits DDL implicitly, so a migration that fails halfway
+# is not recorded and has to be fixed forward by hand before re-running.
+
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+import argparse
+import hashlib
+import logging
+import re
+import sys
+
+from common.config import BASE_DIR, MYSQL_CFG
+
+logger = logging.getLogger("mysql")
+
+SCHEMA = "kopilot_zoom"
+MIGRATIONS_DIR = BASE_DIR / "migrations"
+LOCK_NAME = f"{SCHEMA}.migrations"
+
+MIGRATION_FILE = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+SCHEMA_MIGRATIONS_SQL = f"""
+CREATE TABLE IF NOT EXISTS `{SCHEMA}`.`schema_migrations` (
+    `version` INT PRIMARY KEY,
+    `name` VARCHAR(255) NOT NULL,
+    `checksum` CHAR(64) NOT NULL,
+    `baseline` BOOLEAN DEFAULT FALSE,
+    `execution_ms` INT,
+    `applied_at` DATETIME(6) DEFAULT CURRENT_TIMESTAMP(6)
+);
+"""
+
+APPLIED_SQL = f"""
+SELECT `version`, `name`, `checksum`, `baseline`, `applied_at` FROM `{SCHEMA}`.`schema_migrations` ORDER BY `version`;
+"""
+
+RECORD_SQL = f"""
+INSERT INTO `{SCHEMA}`.`schema_migrations` (`version`, `name`, `checksum`, `baseline`, `execution_ms`)
+VALUES (%s, %s, %s, %s, %s);
+"""
+
+def split_sql(script: str) -> List[str]:
+    lines = [line for line in script.splitlines() if not line.strip().startswith("--")]
+    return [stmt.strip() for stmt in "\n".join(lines).split(";") if stmt.strip()]
+
+
+class Migration:
+    __slots__ = ("version", "name", "path", "sql", "checksum")
+
+    def __init__(self, version: int, name: str, path: Path):
+        self.version = version
+        self.name = name
+        self.path = path
+        self.sql = path.read_text(encoding="utf-8")
+        self.checksum = hashlib.sha256(self.sql.encode()).hexdigest()
+
+    def __repr__(self):
+        return f"{self.version:04d}_{self.name}"
+
+
+def discover(directory: Path = MIGRATIONS_DIR) -> List[Migration]:
+    migrations = []
+    for path in sorted(directory.glob("*.sql")):
+        match = MIGRATION_FILE.match(path.name)
+        if not match:
+            logger.warning(f"Ignoring {path.name}, expected NNNN_name.sql")
+            continue
+        migrations.append(Migration(int(match.group(1)), match.group(2), path))
+
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration versions in {directory}")
+    return migrations
+
+
+class MigrationRunner:
+
+    def __init__(self, connect_args: Optional[Dict[str, Any]] = None, directory: Path = MIGRATIONS_DIR):
+        # connect without a default database, it may not exist yet
+        self.connect_args = {k: v for k, v in (connect_args or MYSQL_CFG).items() if k != "database"}
+        self.migrations = discover(directory)
+
+    def _connect(self):
+        import mysql.connector
+
+        con = mysql.connector.connect(**self.connect_args)
+        cursor = con.cursor()
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{SCHEMA}`;")
+        # 0001 references tables without the schema prefix
+        cursor.execute(f"USE `{SCHEMA}`;")
+        cursor.execute(SCHEMA_MIGRATIONS_SQL)
+        cursor.close()
+        return con
+
+    def _applied(self, con) -> Dict[int, Dict[str, Any]]:
+        cursor = con.cursor(dictionary=True)
+        cursor.execute(APPLIED_SQL)
+        applied = {row["version"]: row for row in cursor.fetchall()}
+        cursor.close()
+        return applied
+
+    def _check(self, applied: Dict[int, Dict[str, Any]]):
+        changed = [
+            str(m) for m in self.migrations
+            if m.version in applied and not applied[m.version]["baseline"] and applied[m.version]["checksum"] != m.checksum
+        ]
+        if changed:
+            raise RuntimeError(f"Applied migrations were edited afterwards: {', '.join(changed)}; add a new migration instead")
+
+    def status(self) -> List[Dict[str, Any]]:
+        con = self._connect()
+        try:
+            applied = self._applied(con)
+        finally:
+            con.close()
+
+        rows = []
+        for migration in self.migrations:
+            record = applied.get(migration.version)
+            if record is None:
+                state = "pending"
+            elif record["baseline"]:
+                state = "baseline"
+            elif record["checksum"] != migration.checksum:
+                state = "changed"
+            else:
+                state = "applied"
+            rows.append({
+                "version": migration.version,
+                "name": migration.name,
+                "state": state,
+                "applied_at": record["applied_at"].isoformat() if record else None,
+            })
+        return rows
+
+    def migrate(self, target: Optional[int] = None, dry_run: bool = False) -> List[Migration]:
+        con = self._connect()
+        cursor = con.cursor()
+        try:
+            # one runner at a time when several replicas start together
+            cursor.execute("SELECT GET_LOCK(%s, 60);", (LOCK_NAME,))
+            if cursor.fetchone()[0] != 1:
+                raise RuntimeError(f"Could not acquire migration lock {LOCK_NAME}")
+            try:
+                applied = self._applied(con)
+                self._check(applied)
+                pending = [
+                    m for m in self.migrations
+                    if m.version not in applied and (target is None or m.version <= target)
+                ]
+                for migration in pending:
+                    if dry_run:
+                        logger.info(f"Would apply {migration}")
+                        continue
+                    self._apply(con, cursor, migration)
+                return pending
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s);", (LOCK_NAME,))
+                cursor.fetchone()
+        finally:
+            cursor.close()
+            con.close()
+
+    def _apply(self, con, cursor, migration: Migration):
+        started = datetime.now(timezone.utc)
+        statements = split_sql(migration.sql)
+        for i, statement in enumerate(statements, 1):
+            try:
+                cursor.execute(statement)
+            except Exception as e:
+                con.rollback()
+                raise RuntimeError(f"{migration} failed at statement {i}/{len(statements)}: {e}") from e
+        elapsed_ms = int((datetime.now(timezone.utc) - started).total_seconds() * 1000)
+        cursor.execute(RECORD_SQL, (migration.version, migration.name, migration.checksum, False, elapsed_ms))
+        con.commit()
+        logger.info(f"Applied {migration} ({len(statements)} statements, {elapsed_ms}ms)")
+
+    def baseline(self, version: Optional[int] = None) -> List[Migration]:
+        con = self._connect()
+        cursor = con.cursor()
+        try:
+            applied = self._applied(con)
+            marked = [
+                m for m in self.migrations
+                if m.version not in applied and (version is None or m.version <= version)
+            ]
+            for migration in marked:
+                cursor.execute(RECORD_SQL, (migration.version, migration.name, migration.checksum, True, None))
+            con.commit()
+            for migration in marked:
+                logger.info(f"Marked {migration} as applied (baseline)")
+            return marked
+        finally:
+            cursor.close()
+            con.close()
+
+    def explain(self, queries: List[tuple]) -> List[Dict[str, Any]]:
+        con = self._connect()
+        cursor = con.cursor(dictionary=True)
+        results = []
+        try:
+            for name, query, params in queries:
+                cursor.execute(f"EXPLAIN {query.strip().rstrip(';')}", params)
+                plan = cursor.fetchall()
+                results.append({"query": name, **judge(plan)})
+        finally:
+            cursor.close()
+            con.close()
+        return results
+
+
+def judge(plan: List[Dict[str, Any]]) -> Dict[str, Any]:
+    problems = []
+    inconclusive = False
+    for row in plan:
+        extra = row.get("Extra") or ""
+        if not row.get("table") or row.get("table", "").startswith("<"):
+            continue
+        if "Impossible WHERE" in extra or "no matching row" in extra or "const row not found" in extra:
+            # an empty table short-circuits the plan, run against real data to be sure
+            inconclusive = True
+            continue
+        if row.get("type") == "ALL" or row.get("key") is None:
+            problems.append(f"full scan of {row['table']}")
+        elif row.get("type") == "index":
+            problems.append(f"full index scan of {row['table']} ({row['key']})")
+    return {
+        "ok": not problems,
+        "inconclusive": inconclusive and not problems,
+        "problems": problems,
+        "plan": [{k: row.get(k) for k in ("table", "type", "key", "rows", "Extra")} for row in plan],
+    }
+
+
+def handler_queries() -> List[tuple]:
+    # imported here: loading handler modules registers their subscriptions
+    from common import attendance
+    from handlers import archive, event, reconcile, recording, sync
+
+    now = datetime.now(timezone.utc)
+    start_window, recording_window = (check[3] for check in reconcile.checks(now))
+    meeting_id = 81234567890
+    email = "someone@example.com"
+    return [
+        ("event.meeting_exists", event.MEETING_EXISTS_SQL, (meeting_id,)),
+        ("event.meeting_deleted", event.MEETING_DELETED_SQL, (meeting_id,)),
+        ("event.registrant_id", event.REGISTRANT_ID_SQL, ("abc", meeting_id, email)),
+        ("event.meeting_started", event.MEETING_STARTED_SQL, (now, meeting_id)),
+        ("event.meeting_ended", event.MEETING_ENDED_SQL, (now, now, 60, meeting_id)),
+        ("event.processed", event.EVENT_PROCESSED_SQL, (now, "done", 1)),
+        ("event.error_processing", event.EVENT_ERROR_SQL, ("error", 1)),
+        ("attendance.participated", attendance.PARTICIPATED_SQL, (meeting_id, email)),
+        ("attendance.resume_leave", attendance.RESUME_LEAVE_SQL, (now, now, now, "uuid==", email)),
+        ("attendance.close_open", attendance.CLOSE_OPEN_SQL, (now, now, now, "uuid==")),
+        ("recording.upsert", recording.RECORDING_UPSERT_SQL, ("uuid==", "https://", 60, 1, 1, meeting_id)),
+        ("recording.exists", recording.RECORDING_EXISTS_SQL, ("uuid==",)),
+        ("recording.ready", recording.RECORDING_READY_SQL, ("uuid==",)),
+        ("sync.past_meeting", sync.PAST_MEETING_SQL, (now, now, 60, meeting_id)),
+        ("reconcile.stale_start", reconcile.STALE_START_SQL, (*start_window, 50)),
+        ("reconcile.missing_recording", reconcile.MISSING_RECORDING_SQL, (*recording_window, 50)),
+        ("archive.cold_meetings", archive.COLD_MEETINGS_SQL, (now, 200)),
+        ("archive.meeting_lookup", archive.SELECT_SQL.format(table="meeting_archive", ids="%s"), (meeting_id,)),
+        ("archive.registrant_lookup", archive.SELECT_SQL.format(table="registrant_archive", ids="%s"), (meeting_id,)),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply and inspect kopilot_zoom schema migrations.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status")
+    migrate = commands.add_parser("migrate")
+    migrate.add_argument("--to", type=int, help="stop after this version")
+    migrate.add_argument("--dry-run", action="store_true")
+    baseline = commands.add_parser("baseline", help="record migrations as applied without running them")
+    baseline.add_argument("version", type=int, nargs="?", help="default: all")
+    explain = commands.add_parser("explain", help="check that every handler query uses an index")
+    explain.add_argument(
+        "--allow-inconclusive", action="store_true",
+        help="pass plans that short-circuit on empty tables instead of failing",
+    )
+    args = parser.parse_args()
+
+    runner = MigrationRunner()
+    if args.command == "status":
+        for row in runner.status():
+            print(f"{row['version']:04d}_{row['name']:<30} {row['state']:<9} {row['applied_at'] or ''}")
+    elif args.command == "migrate":
+        applied = runner.migrate(args.to, args.dry_run)
+        print(f"{'Pending' if args.dry_run else 'Applied'}: {', '.join(map(str, applied)) or 'nothing'}")
+    elif args.command == "baseline":
+        marked = runner.baseline(args.version)
+        print(f"Baselined: {', '.join(map(str, marked)) or 'nothing'}")
+    elif args.command == "explain":
+        results = runner.explain(handler_queries())
+        for result in results:
+            state = "ok" if result["ok"] else "FAIL"
+            if result["inconclusive"]:
+                state = "ok?"
+            print(f"{state:<5} {result['query']:<32} {'; '.join(result['problems']) or result['plan']}")
+        if not all(result["ok"] for result in results):
+            sys.exit(1)
+        if any(result["inconclusive"] for result in results) and not args.allow_inconclusive:
+            # an empty table proves nothing about index use
+            print("Inconclusive plans, run against a database with data or pass --allow-inconclusive")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
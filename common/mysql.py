@@ -1,42 +1,90 @@
 import logging
 from contextlib import contextmanager, asynccontextmanager
-from typing import Optional, Type, Union
+from typing import Optional, Type, Union, Dict, Any
+import time
 
-from common.config import MYSQL_CFG
+from common.config import MYSQL_CFG, MYSQL_POOL_CFG
+from common.mysql_pool import ConnectionPool
+from common.diagnostics import span
 
-from mysql.connector import Error
-from mysql.connector.pooling import MySQLConnectionPool
 import anyio
 from anyio import to_thread, Semaphore
 
 logger = logging.getLogger("mysql")
 
 class MySQL:
-    _instance: Optional[MySQLConnectionPool] = None
-    _semaphore = Semaphore(MYSQL_CFG.get("pool_size", 5))
+    # mysql.connector is imported on first use so roles that never query skip it
+    _instance: Optional[ConnectionPool] = None
+    _semaphore: Optional[Semaphore] = None
+
+    _queued = 0
+    _queue_waits = 0
+    _queue_wait_total = 0.0
+    _queue_wait_max = 0.0
+    _queue_timeouts = 0
 
     @classmethod
-    def get_pool(cls) -> MySQLConnectionPool:
+    def get_pool(cls) -> ConnectionPool:
         if cls._instance is None:
-            cls._instance = MySQLConnectionPool(**MYSQL_CFG)
+            cls._instance = ConnectionPool(**MYSQL_POOL_CFG, **MYSQL_CFG)
         return cls._instance
 
+    @classmethod
+    def get_semaphore(cls) -> Semaphore:
+        # one worker thread per pooled connection; further callers queue here, off-thread
+        if cls._semaphore is None:
+            cls._semaphore = Semaphore(cls.get_pool().capacity)
+        return cls._semaphore
+
+    @classmethod
+    def close(cls):
+        if cls._instance is not None:
+            cls._instance.close()
+            cls._instance = None
+            logger.info("MySQL pool closed")
+
+    @classmethod
+    async def aclose(cls):
+        await to_thread.run_sync(cls.close)
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        pool = cls._instance.stats() if cls._instance else {}
+        return {
+            **pool,
+            "queued": cls._queued,
+            "queue_waits": cls._queue_waits,
+            "queue_wait_avg_ms": round(cls._queue_wait_total / cls._queue_waits * 1000, 3) if cls._queue_waits else 0.0,
+            "queue_wait_max_ms": round(cls._queue_wait_max * 1000, 3),
+            "queue_timeouts": cls._queue_timeouts,
+        }
+
     @classmethod
     @contextmanager
     def connection(cls):
+        from mysql.connector import Error
+
         pool = cls.get_pool()
-        con = None
+        pooled = None
+        discard = False
         try:
-            con = pool.get_connection()
-            yield con
+            pooled = pool.checkout()
+            yield pooled.con
         except Error as e:
             logger.error(f"Database error: {e}")
-            if con:
-                con.rollback()
+            if pooled:
+                try:
+                    pooled.con.rollback()
+                except Error:
+                    discard = True
+            raise
+        except BaseException:
+            if pooled:
+                discard = True
             raise
         finally:
-            if con and con.is_connected():
-                con.close()
+            if pooled:
+                pool.checkin(pooled, discard=discard)
     
     @classmethod
     def execute_query(
@@ -120,19 +168,64 @@ class MySQL:
                 if cursor:
                     cursor.close()
     
+    @classmethod
+    def execute_transaction(
+        cls,
+        func,
+        *args
+    ):
+        # func(cursor, *args) runs its statements in one transaction on one connection
+        with cls.connection() as con:
+            cursor = None
+            try:
+                con.start_transaction()
+                cursor = con.cursor(dictionary=True)
+                result = func(cursor, *args)
+                con.commit()
+                logger.debug(f"Transaction committed: {getattr(func, '__name__', func)}")
+                return result
+            finally:
+                if cursor:
+                    cursor.close()
+    
+    @classmethod
+    async def _run(cls, func, *args):
+        from mysql.connector.errors import PoolError
+
+        semaphore = cls.get_semaphore()
+        started = time.monotonic()
+        cls._queued += 1
+        try:
+            with span("db_queue"), anyio.fail_after(MYSQL_POOL_CFG.get("timeout", 10)):
+                await semaphore.acquire()
+        except TimeoutError:
+            cls._queue_timeouts += 1
+            raise PoolError(f"Timed out waiting for a database slot ({cls._queued} queued)")
+        finally:
+            cls._queued -= 1
+        waited = time.monotonic() - started
+        cls._queue_waits += 1
+        cls._queue_wait_total += waited
+        cls._queue_wait_max = max(cls._queue_wait_max, waited)
+
+        try:
+            with span("db_exec"):
+                return await to_thread.run_sync(func, *args)
+        finally:
+            semaphore.release()
+
     @classmethod
     async def aexecute_query(cls, query, params=None, fetch_one=False):
-        async with cls._semaphore:
-            return await to_thread.run_sync(cls.execute_query, query, params, fetch_one)
+        return await cls._run(cls.execute_query, query, params, fetch_one)
     @classmethod
     async def aexecute_update(cls, query, params=None):
-        async with cls._semaphore:
-            return await to_thread.run_sync(cls.execute_update, query, params)
+        return await cls._run(cls.execute_update, query, params)
     @classmethod
     async def aexecute_insert(cls, query, params=None):
-        async with cls._semaphore:
-            return await to_thread.run_sync(cls.execute_insert, query, params)
+        return await cls._run(cls.execute_insert, query, params)
     @classmethod
     async def aexecute_many(cls, query, params_list):
-        async with cls._semaphore:
-            return await to_thread.run_sync(cls.execute_many, query, params_list)
\ No newline at end of file
+        return await cls._run(cls.execute_many, query, params_list)
+    @classmethod
+    async def aexecute_transaction(cls, func, *args):
+        return await cls._run(cls.execute_transaction, func, *args)
\ No newline at end of file
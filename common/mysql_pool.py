@@ -0,0 +1,182 @@
+import logging
+from collections import deque
+from typing import Dict, Any, Optional
+import threading
+import time
+
+logger = logging.getLogger("mysql")
+
+class PooledConnection:
+    __slots__ = ("con", "created", "last_used")
+
+    def __init__(self, con):
+        self.con = con
+        self.created = time.monotonic()
+        self.last_used = self.created
+
+
+class ConnectionPool:
+
+    def __init__(
+        self,
+        size: int = 5,
+        max_overflow: int = 10,
+        timeout: float = 10,
+        recycle: float = 1800,
+        ping_after: float = 30,
+        **connect_args
+    ):
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_after = ping_after
+        self.connect_args = connect_args
+
+        # LIFO so the warmest connections are reused and surplus ones age out
+        self._idle: deque = deque()
+        self._cond = threading.Condition()
+        self._total = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = False
+
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+        self.failures = 0
+        self.recycled = 0
+        self.ping_failures = 0
+        self.discarded = 0
+        self.reset_failures = 0
+        self.peak_in_use = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.size + self.max_overflow
+
+    def _connect(self) -> PooledConnection:
+        import mysql.connector
+        return PooledConnection(mysql.connector.connect(**self.connect_args))
+
+    def _close(self, pooled: PooledConnection):
+        try:
+            pooled.con.close()
+        except Exception:
+            pass
+
+    def checkout(self, timeout: Optional[float] = None) -> PooledConnection:
+        from mysql.connector.errors import PoolError
+
+        started = time.monotonic()
+        deadline = started + (self.timeout if timeout is None else timeout)
+        pooled = None
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolError("Connection pool is closed")
+                if self._idle:
+                    pooled = self._idle.pop()
+                    break
+                if self._total < self.capacity:
+                    self._total += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolError(
+                        f"Timed out after {time.monotonic() - started:.1f}s waiting for a connection "
+                        f"({self._in_use} in use, {self._waiting} waiting)"
+                    )
+                self._waiting += 1
+                self._cond.wait(remaining)
+                self._waiting -= 1
+
+            self._in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self._in_use)
+            waited = time.monotonic() - started
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+        try:
+            return self._validate(pooled) if pooled else self._connect()
+        except Exception:
+            with self._cond:
+                self.failures += 1
+                self._total -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def _validate(self, pooled: PooledConnection) -> PooledConnection:
+        now = time.monotonic()
+        if now - pooled.created > self.recycle:
+            self.recycled += 1
+            self._close(pooled)
+            return self._connect()
+        if now - pooled.last_used > self.ping_after:
+            # only connections idle long enough to have hit wait_timeout pay for a ping
+            try:
+                pooled.con.ping(reconnect=False)
+            except Exception:
+                self.ping_failures += 1
+                self._close(pooled)
+                return self._connect()
+        return pooled
+
+    def checkin(self, pooled: PooledConnection, discard: bool = False):
+        if not discard and not self._closed:
+            # autocommit is off: end the transaction a plain SELECT leaves open, so the
+            # next user does not read an old REPEATABLE READ snapshot and purge is not held back
+            try:
+                pooled.con.rollback()
+            except Exception:
+                self.reset_failures += 1
+                discard = True
+        with self._cond:
+            self._in_use -= 1
+            if discard or self._closed or len(self._idle) >= self.size:
+                self._total -= 1
+                if discard:
+                    self.discarded += 1
+                close = True
+            else:
+                pooled.last_used = time.monotonic()
+                self._idle.append(pooled)
+                close = False
+            self._cond.notify()
+        if close:
+            self._close(pooled)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._total -= len(idle)
+            self._cond.notify_all()
+        for pooled in idle:
+            self._close(pooled)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "open": self._total,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "waiting": self._waiting,
+                "peak_in_use": self.peak_in_use,
+                "utilization": round(self._in_use / self.capacity, 3) if self.capacity else 0.0,
+                "checkouts": self.checkouts,
+                "wait_avg_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+                "timeouts": self.timeouts,
+                "failures": self.failures,
+                "recycled": self.recycled,
+                "ping_failures": self.ping_failures,
+                "discarded": self.discarded,
+                "reset_failures": self.reset_failures,
+            }
@@ -1,70 +1,320 @@
+import asyncio
 import json
 import logging
+import os
+import random
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from fnmatch import fnmatch
 from typing import Dict, Any, Optional, List, Callable
 
-from common.config import NATS_CFG
+from common.config import NATS_CFG, NATS_PUBLISH_CFG
+from common.diagnostics import diagnostics, span
 
 import nats
 import anyio
 
 logger = logging.getLogger("nats")
 
+TRACE_HEADER = "Trace-Id"
+EVENT_HEADER = "Event-Id"
+PROPAGATED_HEADERS = (TRACE_HEADER, EVENT_HEADER)
+
+# headers of the message being handled, copied onto everything it publishes
+_headers: ContextVar[Optional[Dict[str, str]]] = ContextVar("nats_headers", default=None)
+
 class NATSServer:
     def __init__(self):
         self._connection : Optional[nats.NATS] = None
 
         self.pending_subscribers: List[tuple] = []
         self.pending_responders: List[tuple] = []
+        self.enabled_subjects: List[str] = []
+        self.startup_hooks: List[Callable] = []
+        self.shutdown_hooks: List[Callable] = []
+        self.periodic_jobs: List[tuple] = []
+
+        self._subscriptions: List = []
+        self._late_subscriptions: List = []
+        self._periodic: List[asyncio.Task] = []
+        self._inflight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+        self._outbound: asyncio.Queue = asyncio.Queue(maxsize=NATS_PUBLISH_CFG['queue_size'])
+        self._retry: deque = deque()
+        self._sender: Optional[asyncio.Task] = None
+        self._closing = False
+        self.published = 0
+        self.batches = 0
+        self.retried = 0
+        self.dropped = 0
     
     async def connect(self):
         if self._connection is None or not self._connection.is_connected:
             try:
-                self._connection = await nats.connect(**NATS_CFG)
+                self._closing = False
+                self._connection = await nats.connect(
+                    **NATS_CFG,
+                    disconnected_cb=self._on_disconnected,
+                    reconnected_cb=self._on_reconnected,
+                    closed_cb=self._on_closed,
+                )
                 logger.info("Connected to NATS server")
+                if self._sender is None:
+                    self._sender = asyncio.create_task(self._send_loop())
+
+                # before any subscription, so handlers never see half-initialized state
+                startup_hooks, self.startup_hooks = self.startup_hooks, []
+                for hook in startup_hooks:
+                    await hook()
 
                 await self._register_pending_handlers()
+                self._start_periodic_jobs()
             except Exception as e:
                 logger.error(f"Failed to connect to NATS: {e}")
                 raise
     
     async def close(self):
+        self._closing = True
+        if self._sender:
+            self._sender.cancel()
+            self._sender = None
         if self._connection and self._connection.is_connected:
             await self._connection.close()
             self._connection = None
             logger.info("NATS connection closed")
+
+    async def drain(self, timeout: float = 25):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+
+        # no new scheduled runs; a run in progress is cut short, jobs must be safe to repeat
+        periodic, self._periodic = self._periodic, []
+        for task in periodic:
+            task.cancel()
+        await asyncio.gather(*periodic, return_exceptions=True)
+
+        # stop deliveries, let already-buffered messages run through their handlers
+        subscriptions, self._subscriptions = self._subscriptions, []
+        await self._drain_subscriptions(subscriptions, deadline)
+
+        for hook in self.shutdown_hooks:
+            try:
+                await hook()
+            except Exception as e:
+                logger.error(f"Shutdown hook {hook.__name__} failed: {e}")
+
+        # the hooks' final flushes publish acks; the subscriptions consuming them stay
+        # open until those are sent, a single instance has no one else to handle them
+        await self._flush_outbound(max(0.0, deadline - loop.time()))
+        late, self._late_subscriptions = self._late_subscriptions, []
+        if late:
+            await self._drain_subscriptions(late, deadline)
+            await self._flush_outbound(max(0.0, deadline - loop.time()))
+
+        if self._sender:
+            self._sender.cancel()
+            self._sender = None
+
+        if self._connection and self._connection.is_connected:
+            self._closing = True
+            # flushes pending publishes, then closes
+            await self._connection.drain()
+            self._connection = None
+            logger.info("NATS connection drained")
+
+    async def _drain_subscriptions(self, subscriptions: List, deadline: float):
+        loop = asyncio.get_running_loop()
+        if subscriptions:
+            try:
+                await asyncio.wait_for(
+                    asyncio.gather(*(sub.drain() for sub in subscriptions), return_exceptions=True),
+                    timeout=max(0.0, deadline - loop.time())
+                )
+            except asyncio.TimeoutError:
+                logger.warning("Timed out draining subscriptions")
+
+        if self._inflight:
+            logger.info(f"Waiting for {self._inflight} in-flight handlers")
+            try:
+                await asyncio.wait_for(self._idle.wait(), timeout=max(0.0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                logger.warning(f"{self._inflight} handlers still running at shutdown deadline")
+
+    @contextmanager
+    def _in_flight(self, msg=None):
+        self._inflight += 1
+        self._idle.clear()
+        incoming = (msg.headers if msg else None) or {}
+        headers = {name: incoming[name] for name in PROPAGATED_HEADERS if name in incoming}
+        headers.setdefault(TRACE_HEADER, os.urandom(8).hex())
+        token = _headers.set(headers)
+        try:
+            yield
+        finally:
+            _headers.reset(token)
+            self._inflight -= 1
+            if not self._inflight:
+                self._idle.set()
+
+    def annotate(self, name: str, value: Any):
+        # tag the current message's context, e.g. with the Zoom event id
+        headers = _headers.get()
+        if headers is not None:
+            headers[name] = str(value)
+
+    def current_headers(self) -> Optional[Dict[str, str]]:
+        current = _headers.get()
+        return dict(current) if current is not None else None
+
+    @contextmanager
+    def using_headers(self, headers: Optional[Dict[str, str]]):
+        # publish on behalf of a message handled earlier, e.g. from a batch flush
+        token = _headers.set(headers)
+        try:
+            yield
+        finally:
+            _headers.reset(token)
+
+    def _outgoing_headers(self, headers: Optional[Dict[str, str]]) -> Optional[Dict[str, str]]:
+        current = _headers.get()
+        if current is None:
+            return headers
+        return {**current, **headers} if headers else dict(current)
+
+    async def _send_loop(self):
+        batch_size = NATS_PUBLISH_CFG['batch_size']
+        while True:
+            batch = [await self._outbound.get()]
+            while len(batch) < batch_size and not self._outbound.empty():
+                batch.append(self._outbound.get_nowait())
+            try:
+                # publish only appends to the client's pending buffer, the whole batch goes out in one write
+                for subject, data, headers in batch:
+                    await self._send(subject, data, headers)
+                self.batches += 1
+            finally:
+                for _ in batch:
+                    self._outbound.task_done()
+
+    async def _send(self, subject: str, data: Any, headers: Optional[Dict[str, str]]):
+        from nats.errors import ConnectionClosedError, ConnectionReconnectingError, OutboundBufferLimitError
+
+        try:
+            payload = data if isinstance(data, bytes) else json.dumps(data).encode()
+        except (TypeError, ValueError) as e:
+            self.dropped += 1
+            logger.error(f"Dropping publish to {subject}, payload not serializable: {e}")
+            return
+
+        if self._connection is None or not self._connection.is_connected:
+            self._hold(subject, payload, headers)
+            return
+        try:
+            await self._connection.publish(subject, payload, headers=headers)
+            self.published += 1
+        except (ConnectionClosedError, ConnectionReconnectingError, OutboundBufferLimitError):
+            self._hold(subject, payload, headers)
+        except Exception as e:
+            self.dropped += 1
+            logger.error(f"Failed to publish to {subject}: {e}")
+
+    def _hold(self, subject: str, payload: bytes, headers: Optional[Dict[str, str]]):
+        if len(self._retry) >= NATS_PUBLISH_CFG['retry_size']:
+            dropped_subject = self._retry.popleft()[0]
+            self.dropped += 1
+            logger.warning(f"Publish retry buffer full, dropped oldest message to {dropped_subject}")
+        self._retry.append((subject, payload, headers))
+
+    async def _replay(self):
+        retried, self._retry = self._retry, deque()
+        if not retried:
+            return
+        logger.info(f"Replaying {len(retried)} publishes buffered while disconnected")
+        self.retried += len(retried)
+        for subject, payload, headers in retried:
+            await self._send(subject, payload, headers)
+
+    async def _flush_outbound(self, timeout: float):
+        try:
+            await asyncio.wait_for(self._outbound.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"{self._outbound.qsize()} publishes still queued at shutdown deadline")
+        if self._connection and self._connection.is_connected:
+            await self._replay()
+        if self._retry:
+            logger.error(f"Discarding {len(self._retry)} publishes buffered while disconnected")
+            self._retry.clear()
+
+    async def _on_disconnected(self):
+        if self._closing:
+            return
+        logger.warning("Disconnected from NATS server, buffering publishes")
+
+    async def _on_reconnected(self):
+        logger.info("Reconnected to NATS server")
+        await self._replay()
+
+    async def _on_closed(self):
+        if self._retry or not self._outbound.empty():
+            logger.error(
+                f"NATS connection closed with {len(self._retry)} buffered "
+                f"and {self._outbound.qsize()} queued publishes"
+            )
     
     
+    def enable(self, patterns: List[str]):
+        self.enabled_subjects = list(patterns)
+
+    def _is_enabled(self, subject: str) -> bool:
+        if not self.enabled_subjects:
+            return True
+        if any(fnmatch(subject, pattern) for pattern in self.enabled_subjects):
+            return True
+        logger.info(f"Subject {subject} not enabled for this process, skipping.")
+        return False
+
     async def _register_pending_handlers(self):
 
-        for subject, handler in self.pending_subscribers:
-            async def wrapper(msg, h=handler):
-                try:
-                    data = json.loads(msg.data.decode()) if msg.data else {}
-                    await h(data)
-                except Exception as e:
-                    logger.error(f"Error in {subject}: {e}")
+        for subject, handler, drain_last in self.pending_subscribers:
+            if not self._is_enabled(subject):
+                continue
+            async def wrapper(msg, h=handler, s=subject):
+                with self._in_flight(msg), diagnostics.trace(s):
+                    try:
+                        data = json.loads(msg.data.decode()) if msg.data else {}
+                        await h(data)
+                    except Exception as e:
+                        logger.error(f"Error in {subject}: {e}")
             
-            await self._connection.subscribe(subject, cb=wrapper)
+            subscription = await self._connection.subscribe(subject, cb=wrapper)
+            (self._late_subscriptions if drain_last else self._subscriptions).append(subscription)
             logging.info(f"Registered subscription: {subject}")
 
         for subject, handler in self.pending_responders:
-            async def wrapper(msg, h=handler):
-                try:
-                    data = json.loads(msg.data.decode()) if msg.data else {}
-                    result = await h(data)
-                    response = json.dumps(result).encode()
-                    await msg.respond(response)
-                except Exception as e:
-                    logger.error(f"Error handling {subject}: {e}")
-                    error_response = json.dumps({"error": str(e)}).encode()
-                    await msg.respond(error_response)
+            if not self._is_enabled(subject):
+                continue
+            async def wrapper(msg, h=handler, s=subject):
+                with self._in_flight(msg), diagnostics.trace(s):
+                    try:
+                        data = json.loads(msg.data.decode()) if msg.data else {}
+                        result = await h(data)
+                        response = json.dumps(result).encode()
+                        await msg.respond(response)
+                    except Exception as e:
+                        logger.error(f"Error handling {subject}: {e}")
+                        error_response = json.dumps({"error": str(e)}).encode()
+                        await msg.respond(error_response)
 
-            await self._connection.subscribe(subject, cb=wrapper)
+            self._subscriptions.append(await self._connection.subscribe(subject, cb=wrapper))
             logging.info(f"Registered responder: {subject}")
 
-    def sub(self, subject: str):
+    def sub(self, subject: str, drain_last: bool = False):
+        # drain_last: keep consuming at shutdown until the shutdown hooks have run
         def decorator(func: Callable):
-            self.pending_subscribers.append((subject, func))
+            self.pending_subscribers.append((subject, func, drain_last))
             return func
         return decorator
     
@@ -73,14 +323,70 @@ class NATSServer:
             self.pending_responders.append((subject, func))
             return func
         return decorator
+
+    def every(self, seconds: float):
+        def decorator(func: Callable):
+            self.periodic_jobs.append((seconds, func))
+            return func
+        return decorator
+
+    def _start_periodic_jobs(self):
+        if self._periodic:
+            return
+        for seconds, job in self.periodic_jobs:
+            self._periodic.append(asyncio.create_task(self._run_periodic(seconds, job)))
+            logger.info(f"Scheduled {job.__name__} every {seconds}s")
+
+    async def _run_periodic(self, seconds: float, job: Callable):
+        loop = asyncio.get_running_loop()
+        # random first delay so restarts and replicas do not fire together
+        await asyncio.sleep(random.uniform(0, seconds))
+        while True:
+            started = loop.time()
+            with self._in_flight(), diagnostics.trace(f"every.{job.__name__}"):
+                try:
+                    await job()
+                except Exception as e:
+                    logger.error(f"Error in periodic job {job.__name__}: {e}")
+            await asyncio.sleep(max(0.0, seconds - (loop.time() - started)))
+
+    def on_startup(self, func: Callable):
+        self.startup_hooks.append(func)
+        return func
+
+    def on_shutdown(self, func: Callable):
+        self.shutdown_hooks.append(func)
+        return func
     
-    async def pub(self, subject: str, data: dict):
-        message = json.dumps(data).encode()
-        await self._connection.publish(subject, message)
+    async def pub(self, subject: str, data: dict, headers: Optional[Dict[str, str]] = None):
+        # fire-and-forget: serialized and sent by the sender task, blocks only when the queue is full
+        with span("nats_pub"):
+            await self._outbound.put((subject, data, self._outgoing_headers(headers)))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connected": bool(self._connection and self._connection.is_connected),
+            "queued": self._outbound.qsize(),
+            "retry_buffered": len(self._retry),
+            "published": self.published,
+            "batches": self.batches,
+            "retried": self.retried,
+            "dropped": self.dropped,
+            "in_flight": self._inflight,
+        }
+
+    async def key_value(self, bucket: str):
+        from nats.js.errors import BucketNotFoundError
+
+        js = self._connection.jetstream()
+        try:
+            return await js.key_value(bucket)
+        except BucketNotFoundError:
+            return await js.create_key_value(bucket=bucket)
 
     async def request(self, subject:str, data: dict, timeout: int = 5):
         message = json.dumps(data).encode()
-        response = await self._connection.request(subject, message, timeout=timeout)
+        response = await self._connection.request(subject, message, timeout=timeout, headers=self._outgoing_headers(None))
         return json.loads(response.data.decode()) if response.data else None
     
 nc = NATSServer()
\ No newline at end of file
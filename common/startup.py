@@ -0,0 +1,50 @@
+import logging
+from contextlib import contextmanager
+from typing import Dict, Any, List, Tuple
+import os
+import resource
+import sys
+import time
+
+logger = logging.getLogger()
+
+class StartupTimer:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+        self.ready_at = None
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def ready(self):
+        self.ready_at = time.perf_counter()
+
+    def report(self) -> Dict[str, Any]:
+        until = self.ready_at or time.perf_counter()
+        return {
+            "pid": os.getpid(),
+            "total_ms": round((until - self.started) * 1000, 1),
+            "phases": [
+                {"name": name, "ms": round(seconds * 1000, 1)} for name, seconds in self.phases
+            ],
+            "modules_loaded": len(sys.modules),
+            # linux reports ru_maxrss in KiB
+            "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        }
+
+    def log(self):
+        report = self.report()
+        phases = ", ".join(f"{p['name']}={p['ms']}ms" for p in report["phases"])
+        logger.info(
+            f"Startup took {report['total_ms']}ms ({phases}); "
+            f"{report['modules_loaded']} modules, max RSS {report['max_rss_mb']}MB"
+        )
+
+startup = StartupTimer()
@@ -1,4 +1,5 @@
 from datetime import datetime
+from urllib.parse import quote
 import zoneinfo
 
 def get_utc_datetime(start_time, timezone):
@@ -11,4 +12,12 @@ def get_utc_datetime(start_time, timezone):
     else:
         start_time = start_time.astimezone(zoneinfo.ZoneInfo(timezone))
     start_time = start_time.astimezone(zoneinfo.ZoneInfo("UTC"))
-    return start_time
\ No newline at end of file
+    return start_time
+
+def encode_meeting_uuid(meeting_uuid):
+    # a uuid is one path segment, so "/", "+" and "=" are always encoded;
+    # zoom wants uuids starting with "/" or containing "//" double encoded
+    encoded = quote(meeting_uuid, safe='')
+    if meeting_uuid.startswith('/') or '//' in meeting_uuid:
+        encoded = quote(encoded, safe='')
+    return encoded
@@ -1,111 +1,66 @@
 import logging
 from urllib.parse import quote
 from typing import Optional, Dict, Any
-from base64 import b64encode, urlsafe_b64decode
-import json
-import time
 
-from common.config import ZOOM_ACCOUNT_ID, ZOOM_CLIENT_ID, ZOOM_CLIENT_SECRET
-
-import anyio
-from anyio import Semaphore, Lock
-import httpx
-from asynciolimiter import StrictLimiter
+from common.config import ZOOM_API_URL
+from common.diagnostics import span
+from common.zoom_token import ZoomToken
 
 logger = logging.getLogger("zoom")
 
-def decode_jwt(token):
-    try:
-        parts = token.split('.')
-        if len(parts) != 3:
-            return {}
-        
-        payload = parts[1]
-        payload += '=' * (4 - len(payload) % 4)
-        decoded_bytes = urlsafe_b64decode(payload)
-        return json.loads(decoded_bytes.decode('utf-8'))
-    
-    except Exception as e:
-        logger.error(f"Failed to decode JWT: {e}")
-        return {}
-
 class ZoomWorkspace:
 
-    api_url = "https://api.zoom.us/v2/"
-    auth_url = "https://zoom.us/oauth/token"
-    _rate_limiter = StrictLimiter(10/1)
-    _access_token: Optional[str] = None
-    _token_expires_at: Optional[int] = None
-    _lock = Lock()
+    api_url = ZOOM_API_URL
+    _rate_limiter = None
+    _client = None
 
     @classmethod
-    def is_token_expired(cls) -> bool:
-        if not cls._access_token or not cls._token_expires_at:
-            return True
-        buffer_seconds = 300
-        return time.time() + buffer_seconds >= cls._token_expires_at
+    def get_rate_limiter(cls):
+        if cls._rate_limiter is None:
+            from asynciolimiter import StrictLimiter
+            cls._rate_limiter = StrictLimiter(10/1)
+        return cls._rate_limiter
 
     @classmethod
-    async def _get_access_token(cls):
-        auth_header = b64encode(f"{ZOOM_CLIENT_ID}:{ZOOM_CLIENT_SECRET}".encode()).decode()
-
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f'{cls.auth_url}?grant_type=account_credentials&account_id={ZOOM_ACCOUNT_ID}',
-                    headers={
-                        'Authorization': f'Basic {auth_header}',
-                        'Content-Type': 'application/x-www-form-urlencoded'
-                    }
-                )
-                
-                if response.status_code != 200:
-                    logger.critical(f"Failed to get access token from Zoom: {response.status_code} - {response.text}")
-                    return None
-                
-                data = response.json()
-                access_token = data.get('access_token')
-                if not access_token:
-                    logger.error("Access token not found in response from Zoom.")
-                    return None
-                
-                payload = decode_jwt(access_token)
-                cls._token_expires_at = payload.get('exp')
-                cls._access_token = access_token
-                logger.info("Successfully obtained Zoom access token")
-                return access_token
-                
-            except httpx.RequestError as e:
-                logger.exception(f"Request to Zoom API failed: {e}")
-                return None
-            
+    def is_token_expired(cls) -> bool:
+        return ZoomToken.is_expired()
+
     @classmethod
     async def ensure_valid_token(cls):
+        return await ZoomToken.get()
+
+    @classmethod
+    def get_client(cls):
+        # one pooled client per process instead of a TLS handshake per call
+        if cls._client is None or cls._client.is_closed:
+            import httpx
+            cls._client = httpx.AsyncClient(timeout=httpx.Timeout(15.0, connect=5.0))
+        return cls._client
+
+    @classmethod
+    async def close(cls):
+        await ZoomToken.stop()
+        if cls._client is not None:
+            await cls._client.aclose()
+            cls._client = None
+            logger.info("Zoom client closed")
 
-        if not cls.is_token_expired():
-            return cls._access_token
-        
-        async with cls._lock:
-            if not cls.is_token_expired():
-                return cls._access_token
-            
-            return await cls._get_access_token()
-            
     @classmethod
     async def call(cls, method: str, http_method: str = "GET", **kwargs):
 
-        await cls._rate_limiter.wait()
+        import httpx
 
-        if cls.is_token_expired():
-            await cls._get_access_token()
-        access_token = cls._access_token
+        with span("zoom_wait"):
+            await cls.get_rate_limiter().wait()
 
-        access_token = await cls.ensure_valid_token()
+        with span("zoom_token"):
+            access_token = await cls.ensure_valid_token()
         if not access_token:
             logger.error("Failed to obtain access token")
             return None
 
-        encoded_method = quote(method, safe='/')
+        # "%" is kept so segments encoded by the caller, like meeting uuids, pass through as is
+        encoded_method = quote(method, safe='/%')
         url = f"{cls.api_url}{encoded_method}"
         headers = {
             'Authorization': f'Bearer {access_token}',
@@ -113,8 +68,9 @@ class ZoomWorkspace:
         }
 
         logger.info(f"Making {http_method} API call to {url}.")
-        async with httpx.AsyncClient() as client:
-            try:
+        client = cls.get_client()
+        try:
+            with span("zoom_http"):
                 if http_method.upper() == "GET":
                     response = await client.get(url, headers=headers, params=kwargs)
                 elif http_method.upper() == "POST":
@@ -128,23 +84,23 @@ class ZoomWorkspace:
                 else:
                     logger.error(f"Unsupported HTTP method: {http_method}")
                     return None
+            
+            if response.status_code in [200, 201, 204]:
+                if response.status_code == 204:  # No content
+                    logger.info(f"API call to {url} succeeded (no content)")
+                    return {}
                 
-                if response.status_code in [200, 201, 204]:
-                    if response.status_code == 204:  # No content
-                        logger.info(f"API call to {url} succeeded (no content)")
-                        return {}
-                    
-                    response_data = response.json()
-                    logger.info(f"API call to {url} succeeded")
-                    return response_data
-                else:
-                    logger.error(f"API call to {url} failed with status code {response.status_code} and response: {response.text}")
-                    return None
-
-            except httpx.RequestError as e:
-                logger.exception(f"An error occurred while making API call to {url}: {e}")
+                response_data = response.json()
+                logger.info(f"API call to {url} succeeded")
+                return response_data
+            else:
+                logger.error(f"API call to {url} failed with status code {response.status_code} and response: {response.text}")
                 return None
 
+        except httpx.RequestError as e:
+            logger.exception(f"An error occurred while making API call to {url}: {e}")
+            return None
+
     @classmethod
     async def get(cls, method: str, **kwargs) -> Optional[Dict[str, Any]]:
         return await cls.call(method, "GET", **kwargs)
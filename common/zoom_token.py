@@ -0,0 +1,318 @@
+import logging
+from base64 import b64encode, urlsafe_b64decode
+from contextlib import asynccontextmanager
+from typing import Optional, Tuple
+import asyncio
+import contextvars
+import fcntl
+import json
+import os
+import random
+import tempfile
+import time
+
+from common.config import ZOOM_ACCOUNT_ID, ZOOM_CLIENT_ID, ZOOM_CLIENT_SECRET, ZOOM_AUTH_URL, ZOOM_TOKEN_CFG
+
+from anyio import Lock, to_thread
+
+logger = logging.getLogger("zoom")
+
+def decode_jwt(token):
+    try:
+        parts = token.split('.')
+        if len(parts) != 3:
+            return {}
+
+        payload = parts[1]
+        payload += '=' * (4 - len(payload) % 4)
+        decoded_bytes = urlsafe_b64decode(payload)
+        return json.loads(decoded_bytes.decode('utf-8'))
+
+    except Exception as e:
+        logger.error(f"Failed to decode JWT: {e}")
+        return {}
+
+
+class MemoryTokenStore:
+
+    async def load(self) -> Optional[Tuple[str, int]]:
+        return None
+
+    async def save(self, access_token: str, expires_at: int):
+        pass
+
+    @asynccontextmanager
+    async def refreshing(self):
+        yield
+
+
+class FileTokenStore:
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+
+    def _read(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return data.get("access_token"), data.get("expires_at")
+
+    def _write(self, access_token, expires_at):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or ".", prefix=".zoom_token")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({"access_token": access_token, "expires_at": expires_at}, f)
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def _acquire(self):
+        fd = os.open(self.lock_path, os.O_CREAT | os.O_RDWR, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        return fd
+
+    def _release(self, fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+    async def load(self):
+        return await to_thread.run_sync(self._read)
+
+    async def save(self, access_token: str, expires_at: int):
+        await to_thread.run_sync(self._write, access_token, expires_at)
+
+    @asynccontextmanager
+    async def refreshing(self):
+        # flock serializes the fetch across worker processes on this host
+        fd = await to_thread.run_sync(self._acquire)
+        try:
+            yield
+        finally:
+            self._release(fd)
+
+
+class NATSTokenStore:
+
+    def __init__(self, bucket: str, key: str):
+        self.bucket = bucket
+        self.key = key
+        self._kv = None
+        self._revision: Optional[int] = None
+
+    async def _get_kv(self):
+        if self._kv is None:
+            from common.nats_server import nc
+            self._kv = await nc.key_value(self.bucket)
+        return self._kv
+
+    async def load(self):
+        from nats.js.errors import KeyNotFoundError
+
+        kv = await self._get_kv()
+        try:
+            entry = await kv.get(self.key)
+        except KeyNotFoundError:
+            self._revision = None
+            return None
+        self._revision = entry.revision
+        data = json.loads(entry.value.decode()) if entry.value else {}
+        return data.get("access_token"), data.get("expires_at")
+
+    async def save(self, access_token: str, expires_at: int):
+        from nats.js.errors import KeyWrongLastSequenceError
+
+        kv = await self._get_kv()
+        value = json.dumps({"access_token": access_token, "expires_at": expires_at}).encode()
+        try:
+            if self._revision is None:
+                self._revision = await kv.create(self.key, value)
+            else:
+                self._revision = await kv.update(self.key, value, last=self._revision)
+        except KeyWrongLastSequenceError:
+            # another worker stored a token first; ours stays valid for this process
+            logger.info("Zoom token in KV was refreshed by another worker")
+
+    @asynccontextmanager
+    async def refreshing(self):
+        yield
+
+
+class ZoomToken:
+
+    auth_url = ZOOM_AUTH_URL
+    buffer_seconds = ZOOM_TOKEN_CFG.get("buffer_seconds", 300)
+    refresh_margin = ZOOM_TOKEN_CFG.get("refresh_margin", 120)
+    retry_seconds = ZOOM_TOKEN_CFG.get("retry_seconds", 10)
+
+    _access_token: Optional[str] = None
+    _expires_at: Optional[int] = None
+    _failed_at: Optional[float] = None
+    _lock = Lock()
+    _store = None
+    _refresher: Optional[asyncio.Task] = None
+
+    @classmethod
+    def get_store(cls):
+        if cls._store is None:
+            store = ZOOM_TOKEN_CFG.get("store", "memory")
+            if store == "file":
+                cls._store = FileTokenStore(ZOOM_TOKEN_CFG["file_path"])
+            elif store == "nats":
+                cls._store = NATSTokenStore(ZOOM_TOKEN_CFG["kv_bucket"], ZOOM_TOKEN_CFG["kv_key"])
+            else:
+                cls._store = MemoryTokenStore()
+        return cls._store
+
+    @classmethod
+    def _is_fresh(cls, expires_at, ahead: float = 0) -> bool:
+        return bool(expires_at) and time.time() + cls.buffer_seconds + ahead < expires_at
+
+    @classmethod
+    def is_expired(cls) -> bool:
+        return not cls._access_token or not cls._is_fresh(cls._expires_at)
+
+    @classmethod
+    def _backing_off(cls) -> bool:
+        return cls._failed_at is not None and time.monotonic() - cls._failed_at < cls.retry_seconds
+
+    @classmethod
+    def _record(cls, refreshed: bool) -> bool:
+        cls._failed_at = None if refreshed else time.monotonic()
+        return refreshed
+
+    @classmethod
+    async def get(cls) -> Optional[str]:
+        # after a failed fetch, callers queued behind it get its outcome instead of each
+        # posting again; the next attempt waits for retry_seconds
+        if cls.is_expired() and not cls._backing_off():
+            async with cls._lock:
+                if cls.is_expired() and not cls._backing_off():
+                    cls._record(await cls._refresh())
+        cls._start_refresher()
+
+        if cls._access_token and cls._expires_at and time.time() < cls._expires_at:
+            return cls._access_token
+        return None
+
+    @classmethod
+    async def _adopt(cls, store, ahead: float) -> bool:
+        try:
+            cached = await store.load()
+        except Exception as e:
+            logger.warning(f"Failed to load shared Zoom token: {e}")
+            return False
+        if cached and cached[0] and cls._is_fresh(cached[1], ahead):
+            cls._access_token, cls._expires_at = cached
+            logger.info("Using shared Zoom access token")
+            return True
+        return False
+
+    @classmethod
+    async def _refresh(cls, ahead: float = 0) -> bool:
+        store = cls.get_store()
+        if await cls._adopt(store, ahead):
+            return True
+
+        try:
+            async with store.refreshing():
+                if await cls._adopt(store, ahead):
+                    return True
+                return await cls._fetch_and_store(store)
+        except Exception as e:
+            logger.warning(f"Shared Zoom token store unavailable, fetching locally: {e}")
+            return await cls._fetch_and_store(None)
+
+    @classmethod
+    async def _fetch_and_store(cls, store) -> bool:
+        access_token, expires_at = await cls._fetch()
+        if not access_token:
+            return False
+        cls._access_token, cls._expires_at = access_token, expires_at
+        if store is not None:
+            # the token is valid locally; a store outage must not cost another fetch
+            try:
+                await store.save(access_token, expires_at)
+            except Exception as e:
+                logger.warning(f"Failed to share Zoom token: {e}")
+        return True
+
+    @classmethod
+    async def _fetch(cls):
+        import httpx
+
+        auth_header = b64encode(f"{ZOOM_CLIENT_ID}:{ZOOM_CLIENT_SECRET}".encode()).decode()
+
+        async with httpx.AsyncClient() as client:
+            try:
+                response = await client.post(
+                    f'{cls.auth_url}?grant_type=account_credentials&account_id={ZOOM_ACCOUNT_ID}',
+                    headers={
+                        'Authorization': f'Basic {auth_header}',
+                        'Content-Type': 'application/x-www-form-urlencoded'
+                    }
+                )
+
+                if response.status_code != 200:
+                    logger.critical(f"Failed to get access token from Zoom: {response.status_code} - {response.text}")
+                    return None, None
+
+                data = response.json()
+                access_token = data.get('access_token')
+                if not access_token:
+                    logger.error("Access token not found in response from Zoom.")
+                    return None, None
+
+                expires_at = decode_jwt(access_token).get('exp')
+                if not expires_at:
+                    expires_at = int(time.time()) + int(data.get('expires_in', 3600))
+                logger.info("Successfully obtained Zoom access token")
+                return access_token, expires_at
+
+            except httpx.RequestError as e:
+                logger.exception(f"Request to Zoom API failed: {e}")
+                return None, None
+
+    @classmethod
+    def _start_refresher(cls):
+        if cls._refresher is None or cls._refresher.done():
+            # started from whichever handler first needs a token; it must not keep that handler's context
+            cls._refresher = asyncio.get_running_loop().create_task(cls._refresh_loop(), context=contextvars.Context())
+
+    @classmethod
+    async def _refresh_loop(cls):
+        while True:
+            if cls._expires_at:
+                # refresh inside the margin, jittered so workers sharing a store rarely race
+                delay = cls._expires_at - cls.buffer_seconds - cls.refresh_margin - time.time()
+                delay += random.uniform(0, cls.refresh_margin / 2)
+            else:
+                delay = cls.retry_seconds
+            await asyncio.sleep(max(delay, 1))
+
+            try:
+                async with cls._lock:
+                    if cls._access_token and cls._is_fresh(cls._expires_at, cls.refresh_margin):
+                        continue
+                    refreshed = cls._record(await cls._refresh(ahead=cls.refresh_margin))
+            except Exception as e:
+                logger.exception(f"Background Zoom token refresh failed: {e}")
+                refreshed = False
+
+            if not refreshed:
+                await asyncio.sleep(cls.retry_seconds)
+
+    @classmethod
+    async def stop(cls):
+        if cls._refresher and not cls._refresher.done():
+            cls._refresher.cancel()
+            try:
+                await cls._refresher
+            except asyncio.CancelledError:
+                pass
+        cls._refresher = None
@@ -0,0 +1,29 @@
+import importlib
+import logging
+import pkgutil
+from typing import List
+
+from common.config import SERVICE_ROLES
+from common.startup import startup
+
+logger = logging.getLogger()
+
+def available() -> List[str]:
+    return sorted(module.name for module in pkgutil.iter_modules(__path__) if not module.name.startswith("_"))
+
+def discover(role: str = "all") -> List[str]:
+    modules = available()
+    if role != "all":
+        if role not in SERVICE_ROLES:
+            raise ValueError(f"Unknown service role {role!r}, expected one of {['all', *SERVICE_ROLES]}")
+        missing = set(SERVICE_ROLES[role]) - set(modules)
+        if missing:
+            raise ValueError(f"Role {role!r} lists unknown handler modules: {sorted(missing)}")
+        modules = [name for name in modules if name in SERVICE_ROLES[role]]
+
+    for name in modules:
+        # importing a handler module runs its @nc.sub / @nc.reply registrations
+        with startup.phase(f"import handlers.{name}"):
+            importlib.import_module(f"{__name__}.{name}")
+    logger.info(f"Loaded handler modules for role {role}: {', '.join(modules)}")
+    return modules
@@ -0,0 +1,144 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+import gzip
+import json
+import logging
+import os
+
+from common.config import ARCHIVE_CFG
+from common.nats_server import nc
+from common.mysql import MySQL as db
+
+import anyio
+from anyio import to_thread
+
+logger = logging.getLogger()
+
+# children before meeting, so nothing references a meeting row when it is deleted
+TABLES = ("registrant", "host", "recording_file", "recording", "attendance", "meeting")
+DETAIL_TABLES = ("host", "recording", "registrant")
+
+# locks the chunk so a concurrent webhook update waits instead of being lost
+COLD_MEETINGS_SQL = """
+SELECT `meeting_id` FROM `kopilot_zoom`.`meeting`
+WHERE `start_time` < %s
+ORDER BY `start_time`
+LIMIT %s
+FOR UPDATE;
+"""
+
+# meeting_id always comes from COLD_MEETINGS_SQL or the caller as a bound parameter;
+# only the table name, from TABLES, is formatted in
+SELECT_SQL = "SELECT * FROM `kopilot_zoom`.`{table}` WHERE `meeting_id` IN ({ids});"
+ARCHIVE_SQL = "REPLACE INTO `kopilot_zoom`.`{table}_archive` SELECT * FROM `kopilot_zoom`.`{table}` WHERE `meeting_id` IN ({ids});"
+DELETE_SQL = "DELETE FROM `kopilot_zoom`.`{table}` WHERE `meeting_id` IN ({ids});"
+
+lock = anyio.Lock()
+totals: Dict[str, int] = {}
+
+def plain(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value.isoformat() if isinstance(value, datetime) else value for key, value in row.items()}
+
+def export_lines(cursor, ids: List[int], placeholders: str) -> List[str]:
+    lines = []
+    for table in TABLES:
+        cursor.execute(SELECT_SQL.format(table=table, ids=placeholders), ids)
+        for row in cursor.fetchall():
+            lines.append(json.dumps({"table": table, "row": plain(row)}, default=str) + "\n")
+    return lines
+
+def write_export(path: str, lines: List[str]):
+    # gzip members can be appended; readers see one stream
+    with gzip.open(path, "at", encoding="utf-8") as f:
+        f.writelines(lines)
+
+def move_chunk(cursor, cutoff: datetime, limit: int, export: bool) -> Tuple[Dict[str, int], List[str]]:
+    cursor.execute(COLD_MEETINGS_SQL, (cutoff, limit))
+    ids = [row["meeting_id"] for row in cursor.fetchall()]
+    if not ids:
+        return {}, []
+
+    placeholders = ", ".join(["%s"] * len(ids))
+    # read inside the transaction, written only once it has committed
+    lines = export_lines(cursor, ids, placeholders) if export else []
+    for table in TABLES:
+        cursor.execute(ARCHIVE_SQL.format(table=table, ids=placeholders), ids)
+
+    moved = {}
+    for table in TABLES:
+        cursor.execute(DELETE_SQL.format(table=table, ids=placeholders), ids)
+        moved[table] = cursor.rowcount
+    return moved, lines
+
+async def archive(max_chunks: int) -> Dict[str, int]:
+    cutoff = datetime.now(timezone.utc) - timedelta(days=ARCHIVE_CFG['after_days'])
+    export_path = None
+    if ARCHIVE_CFG['export_dir']:
+        export_path = os.path.join(ARCHIVE_CFG['export_dir'], f"archive-{datetime.now(timezone.utc):%Y%m%d}.jsonl.gz")
+
+    moved: Dict[str, int] = {}
+    for _ in range(max_chunks):
+        # one short transaction per chunk keeps lock time and undo log small
+        chunk, lines = await db.aexecute_transaction(move_chunk, cutoff, ARCHIVE_CFG['chunk_size'], bool(export_path))
+        if not chunk:
+            break
+        if lines:
+            try:
+                await to_thread.run_sync(write_export, export_path, lines)
+            except Exception as e:
+                # the rows are committed to the archive tables, only the file copy is missing
+                logger.error(f"Failed to export {len(lines)} archived rows to {export_path}: {e}")
+        for table, count in chunk.items():
+            moved[table] = moved.get(table, 0) + count
+        await anyio.sleep(ARCHIVE_CFG['pause'])
+
+    if moved:
+        for table, count in moved.items():
+            totals[table] = totals.get(table, 0) + count
+        logger.info(f"Archived meetings started before {cutoff:%Y-%m-%d}: {moved}")
+    return moved
+
+async def find_meeting(meeting_id: int, registrants: bool = False) -> Optional[Dict[str, Any]]:
+    # hot tables first, archived meetings are the rare case
+    for suffix in ("", "_archive"):
+        meeting = await db.aexecute_query(
+            SELECT_SQL.format(table=f"meeting{suffix}", ids="%s"), (meeting_id,), fetch_one=True
+        )
+        if not meeting:
+            continue
+        details = {}
+        for table in DETAIL_TABLES:
+            if table == "registrant" and not registrants:
+                continue
+            rows = await db.aexecute_query(SELECT_SQL.format(table=f"{table}{suffix}", ids="%s"), (meeting_id,))
+            details[table] = [plain(row) for row in rows or []]
+        return {**plain(meeting), **details, "archived": bool(suffix)}
+    return None
+
+
+@nc.every(ARCHIVE_CFG['interval'])
+async def scheduled_archive():
+    if not ARCHIVE_CFG['enabled'] or lock.locked():
+        return
+    async with lock:
+        await archive(ARCHIVE_CFG['max_chunks'])
+
+
+@nc.reply("zoom.archive.run")
+async def archive_run(data: dict):
+    if not ARCHIVE_CFG['enabled']:
+        return {"error": "Archiving is disabled, set ARCHIVE=true to enable it"}
+    async with lock:
+        moved = await archive(int(data.get("max_chunks") or ARCHIVE_CFG['max_chunks']))
+    return {
+        "moved": moved,
+        "total": totals,
+    }
+
+
+@nc.reply("zoom.meeting.get")
+async def meeting_get(data: dict):
+    meeting = await find_meeting(data.get("meeting_id"), bool(data.get("registrants")))
+    if meeting is None:
+        return {"error": f"Meeting {data.get('meeting_id')} not found"}
+    return meeting
@@ -1,147 +1,176 @@
 from datetime import datetime
 import logging
 
-from common.nats_server import nc
+from common.nats_server import nc, EVENT_HEADER
 from common.mysql import MySQL as db
 from common.utils import get_utc_datetime
+from common.dedupe import deduper
+from common.events import registry, Batch
+from common.attendance import attendance
 
 logger = logging.getLogger()
 
+MEETING_EXISTS_SQL = """
+SELECT * FROM `meeting` WHERE meeting_id = %s LIMIT 1;
+"""
+
+MEETING_DELETED_SQL = """
+UPDATE `kopilot_zoom`.`meeting` SET `is_deleted` = TRUE WHERE meeting_id = %s;
+"""
+
+REGISTRANT_ID_SQL = """
+UPDATE `kopilot_zoom`.`registrant`
+    SET `zoom_registrant_id` = %s
+WHERE `meeting_id` = %s AND `email` = %s;
+"""
+
+MEETING_STARTED_SQL = """
+UPDATE `kopilot_zoom`.`meeting`
+SET
+    `actual_start_time` = %s
+WHERE `meeting_id` = %s;
+"""
+
+MEETING_ENDED_SQL = """
+UPDATE `kopilot_zoom`.`meeting`
+SET
+    `actual_start_time` = %s,
+    `actual_end_time` = %s,
+    `duration` = %s
+WHERE `meeting_id` = %s;
+"""
+
+EVENT_PROCESSED_SQL = """
+UPDATE `kopilot_events`.`raw_events`
+SET 
+    `processed` = TRUE, 
+    `processed_at` = %s,
+    `status` = %s
+WHERE `id` = %s;
+"""
+
+EVENT_ERROR_SQL = """
+UPDATE `kopilot_events`.`raw_events`
+SET 
+    `status` = 'failed',
+    `error_message` = %s,
+    `retry_count` = `retry_count` + 1
+WHERE `id` = %s;
+"""
+
+def utc_time(field):
+    return lambda object: get_utc_datetime(object.get(field), object.get("timezone"))
+
+
+@registry.on("meeting.created", columns={"meeting_id": "id"})
+async def meeting_created(row, object):
+    meeting = await db.aexecute_query(MEETING_EXISTS_SQL, (row["meeting_id"],), fetch_one=True)
+    if not meeting:
+        await nc.pub("zoom.sync.meeting", {
+            "meeting_id": row["meeting_id"]
+        })
+
+
+@registry.on("meeting.updated", columns={"meeting_id": "id"})
+async def meeting_updated(row, object):
+    # the webhook only carries changed fields; let the sync pull the full record
+    await nc.pub("zoom.sync.meeting", {
+        "meeting_id": row["meeting_id"]
+    })
+
+
+@registry.on("meeting.deleted", "webinar.deleted", columns={"meeting_id": "id"}, query=MEETING_DELETED_SQL)
+async def meeting_deleted(row, object):
+    return (row["meeting_id"],)
+
+
+@registry.on(
+    "meeting.registration_created",
+    columns={
+        "meeting_id": "id",
+        "email": "registrant.email",
+        "registrant_id": "registrant.id",
+    },
+    query=REGISTRANT_ID_SQL,
+    batch=Batch(size=100, interval=1.0),
+)
+async def registration_created(row, object):
+    email = row["email"] or ""
+    if ("telegram.local" in email) and (row["registrant_id"]):
+        return (row["registrant_id"], row["meeting_id"], email)
+
+
+@registry.on(
+    "meeting.started", "webinar.started",
+    columns={
+        "meeting_id": "id",
+        "actual_start_time": utc_time("start_time"),
+    },
+    query=MEETING_STARTED_SQL,
+)
+async def meeting_started(row, object):
+    return (row["actual_start_time"], row["meeting_id"])
+
+
+@registry.on(
+    "meeting.participant_joined", "webinar.participant_joined",
+    columns={
+        "meeting_id": "id",
+        "meeting_uuid": "uuid",
+        "participant": "participant",
+    },
+)
+async def participant_joined(row, object):
+    # registrant.participated is set in bulk when attendance flushes
+    attendance.join(row["meeting_id"], row["meeting_uuid"], row["participant"] or {})
+
+
+@registry.on(
+    "meeting.participant_left", "webinar.participant_left",
+    columns={
+        "meeting_id": "id",
+        "meeting_uuid": "uuid",
+        "participant": "participant",
+    },
+)
+async def participant_left(row, object):
+    attendance.leave(row["meeting_id"], row["meeting_uuid"], row["participant"] or {})
+
+
+@registry.on(
+    "meeting.ended", "webinar.ended",
+    columns={
+        "meeting_id": "id",
+        "actual_start_time": utc_time("start_time"),
+        "actual_end_time": utc_time("end_time"),
+        "duration": "duration",
+    },
+    query=MEETING_ENDED_SQL,
+)
+async def meeting_ended(row, object):
+    await attendance.end(row["meeting_id"], object.get("uuid"), object.get("end_time"))
+    return (row["actual_start_time"], row["actual_end_time"], row["duration"], row["meeting_id"])
+
+
+@registry.on("recording.completed")
+async def recording_completed(row, object):
+    # file metadata is stored off the event lane
+    await nc.pub("zoom.recording.completed", {
+        "object": object
+    })
+
+
 @nc.sub("zoom.event")
 async def event(data: dict):
 
     event_id = data['event_id']
-    timestamp = datetime.fromisoformat(data.get("timestamp"))
     event_data = data.get("event", {})
+    # carried as a header on everything published while handling this event
+    nc.annotate(EVENT_HEADER, event_id)
 
-    try:
-
-        event_type = event_data.get("event")
-        event_ts = event_data.get("event_ts")
-        if event_ts:
-            event_ts = int(event_ts)
-            if event_ts > 1e12:  # likely in milliseconds
-                event_time = datetime.fromtimestamp(event_ts / 1000)
-            else:
-                event_time = datetime.fromtimestamp(event_ts)
-        else:
-            event_time = datetime.now()
-        
-        payload = event_data.get("payload", {})
-        
-        account_id = payload.get("account_id")
-        object = payload.get("object", {})
-
-        if event_type == "meeting.created":
-            meeting_id = object.get("id")
-            meeting = await db.aexecute_query(
-                "SELECT * FROM `meeting` WHERE meeting_id = %s LIMIT 1;",
-                (meeting_id,),
-                fetch_one=True
-            )
-            if not meeting:
-                await nc.pub("zoom.sync.meeting", {
-                    "meeting_id": meeting_id
-                })
-        
-        elif event_type == "meeting.deleted":
-            meeting_id = object.get("id")
-            rowsaffected = await db.aexecute_update(
-                "UPDATE `kopilot_zoom`.`meeting` SET `is_deleted` = TRUE WHERE meeting_id = %s;",
-                (meeting_id, )
-            )
-
-        elif event_type == "meeting.registration_created":
-            meeting_id = object.get("id")
-            registrant = object.get("registrant", {})
-            email = registrant.get("email", "")
-            registrant_id = registrant.get("id")
-
-            if ("telegram.local" in email) and (registrant_id):
-                query = """
-                UPDATE `kopilot_zoom`.`registrant`
-                    SET `zoom_registrant_id` = %s
-                WHERE `meeting_id` = %s AND `email` = %s;
-                """
-                params = (registrant_id, meeting_id, email)
-                rowsaffected = await db.aexecute_update(query, params)
-            
-        elif event_type == "meeting.started":
-            meeting_id = object.get("id")
-            actual_start_time = get_utc_datetime(
-                object.get("start_time"),
-                object.get("timezone")
-            )
-            query = """
-            UPDATE `kopilot_zoom`.`meeting`
-            SET
-                `actual_start_time` = %s
-            WHERE `meeting_id` = %s;
-            """
-            params = (actual_start_time, meeting_id)
-            rowsaffected = await db.aexecute_update(query, params)
-
-        elif event_type == "meeting.participant_joined":
-            meeting_id = object.get("id")
-            participant = object.get("participant", {})
-            email = participant.get("email")
-
-            query = """
-            UPDATE `kopilot_zoom`.`registrant`
-                SET `participated` = TRUE
-            WHERE `meeting_id` = %s AND `email` = %s;
-            """
-            rowsaffected = await db.aexecute_update(
-                query,
-                (meeting_id, email)
-            )
-            
-        elif event_type == "meeting.ended":
-            meeting_id = object.get("id")
-            actual_start_time = get_utc_datetime(
-                object.get("start_time"),
-                object.get("timezone")
-            )
-            actual_end_time = get_utc_datetime(
-                object.get("end_time"),
-                object.get("timezone")
-            )
-            duration = object.get("duration")
-            query = """
-            UPDATE `kopilot_zoom`.`meeting`
-            SET
-                `actual_start_time` = %s,
-                `actual_end_time` = %s,
-                `duration` = %s
-            WHERE `meeting_id` = %s;
-            """
-            params = (actual_start_time, actual_end_time, duration, meeting_id)
-            rowsaffected = await db.aexecute_update(query, params)
-            
-        elif event_type == "recording.completed":
-            meeting_id = object.get("id")
-            share_url = object.get("share_url")
-            duration = object.get("duration")
-
-            if share_url:
-                query = """
-                INSERT INTO `kopilot_zoom`.`recording` (
-                    `meeting_id`,
-                    `recording_url`,
-                    `duration`
-                )
-                SELECT
-                    m.`meeting_id`,
-                    %s as `recording_url`,
-                    %s as `duration`
-                FROM `kopilot_zoom`.`meeting` m
-                WHERE m.`meeting_id` = %s;
-                """
-                params = (share_url, duration, meeting_id)
-                rowsaffected = await db.aexecute_update(query, params)
-
-            #TODO publish recording received.
-
+    spec = registry.get(event_data.get("event"))
+    if spec is None:
+        logger.debug(f"Ignoring unhandled event type {event_data.get('event')} ({event_id})")
         await nc.pub(
             "zoom.event.processed",
             {
@@ -149,20 +178,85 @@ async def event(data: dict):
                 "timestamp": datetime.now().isoformat()
             }
         )
-    
-    except Exception as e:
+        return
+
+    dedupe_keys = deduper.keys_for(event_id, event_data)
+    if not deduper.claim(dedupe_keys):
+        logger.info(f"Skipping duplicate event {event_id}")
+        # no handler I/O, but the delivery's raw_events row still has to be closed out
+        await nc.pub(
+            "zoom.event.processed",
+            {
+                "event_id": event_id,
+                "timestamp": datetime.now().isoformat(),
+                "duplicate": True
+            }
+        )
+        return
+
+    # explicit, a batched ack may be published from a flush started by another event
+    ack_headers = {EVENT_HEADER: str(event_id)}
+
+    async def settle(error=None):
+        if error is None:
+            await nc.pub(
+                "zoom.event.processed",
+                {
+                    "event_id": event_id,
+                    "timestamp": datetime.now().isoformat()
+                },
+                headers=ack_headers
+            )
+            return
+        deduper.release(dedupe_keys)
         logger.error(f"Error processing event {event_id}")
         await nc.pub(
             "zoom.event.error_processing",
             {
                 "event_id": event_id,
                 "timestamp": datetime.now().isoformat(),
-                "error_message": str(e)
-            }
+                "error_message": str(error)
+            },
+            headers=ack_headers
         )
 
+    try:
+        object = event_data.get("payload", {}).get("object", {})
+        # batched types are acknowledged by the writer once their row is flushed
+        if not await registry.dispatch(spec, object, settle):
+            await settle()
+    except Exception as e:
+        await settle(e)
+
+
+@nc.on_startup
+async def load_dedupe_index():
+    await deduper.load()
+
+
+@nc.every(deduper.flush_seconds)
+async def flush_dedupe_index():
+    await deduper.flush()
+
+
+@nc.on_shutdown
+async def flush_event_buffers():
+    # final flush, then cancel the flush timers so none fires after db.aclose()
+    await registry.close()
+    await attendance.close()
+    await deduper.close()
+
+
+@nc.reply("zoom.event.stats")
+async def event_stats(data: dict):
+    return {
+        "dedupe": deduper.stats(),
+        "events": registry.stats(),
+        "attendance": attendance.stats()
+    }
+
 
-@nc.sub("zoom.event.processed")
+@nc.sub("zoom.event.processed", drain_last=True)
 async def event_processed(data: dict):
 
     event_id = data.get('event_id')
@@ -178,20 +272,13 @@ async def event_processed(data: dict):
         logger.critical(f"Invalid timestamp format: {timestamp_str}, error: {e}")
         return
     
-    query = """
-    UPDATE `kopilot_events`.`raw_events`
-    SET 
-        `processed` = TRUE, 
-        `processed_at` = %s,
-        `status` = 'done'
-    WHERE `id` = %s;
-    """
-    params = (timestamp, event_id)
-    updated = await db.aexecute_update(query, params)
+    status = "duplicate" if data.get("duplicate") else "done"
+    params = (timestamp, status, event_id)
+    updated = await db.aexecute_update(EVENT_PROCESSED_SQL, params)
     logger.info(f"Updated {updated} event rows as processed.")
 
 
-@nc.sub("zoom.event.error_processing")
+@nc.sub("zoom.event.error_processing", drain_last=True)
 async def event_error_processing(data: dict):
 
     event_id = data.get('event_id')
@@ -201,14 +288,6 @@ async def event_error_processing(data: dict):
         logger.critical(f"Missing required data: event_id={event_id}")
         return
 
-    query = """
-    UPDATE `kopilot_events`.`raw_events`
-    SET 
-        `status` = 'failed',
-        `error_message` = %s,
-        `retry_count` = `retry_count` + 1
-    WHERE `id` = %s;
-    """
     params = (error_message, event_id)
-    updated = await db.aexecute_update(query, params)
+    updated = await db.aexecute_update(EVENT_ERROR_SQL, params)
     logger.info(f"Updated {updated} event rows as failed.")
\ No newline at end of file
@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Tuple
+import logging
+import time
+
+from common.config import RECONCILE_CFG
+from common.nats_server import nc
+from common.mysql import MySQL as db
+
+import anyio
+
+logger = logging.getLogger()
+
+# both scans are range reads on an indexed time column, bounded by the lookback window;
+# a recording row whose files never finished storing keeps ready_at NULL and is queued again
+STALE_START_SQL = """
+SELECT `meeting_id` FROM `kopilot_zoom`.`meeting`
+WHERE `start_time` >= %s AND `start_time` < %s
+    AND `actual_start_time` IS NULL
+    AND `is_deleted` = FALSE
+ORDER BY `start_time` DESC
+LIMIT %s;
+"""
+
+MISSING_RECORDING_SQL = """
+SELECT m.`meeting_id` FROM `kopilot_zoom`.`meeting` m
+LEFT JOIN `kopilot_zoom`.`recording` r ON r.`meeting_id` = m.`meeting_id`
+WHERE m.`actual_end_time` >= %s AND m.`actual_end_time` < %s
+    AND m.`is_deleted` = FALSE
+    AND (r.`id` IS NULL OR (r.`ready_at` IS NULL AND r.`date_created` < %s))
+ORDER BY m.`actual_end_time` DESC
+LIMIT %s;
+"""
+
+# (check, meeting_id) -> monotonic time it may be queued again
+cooldowns: Dict[Tuple[str, int], float] = {}
+last_run: Dict[str, int] = {}
+lock = anyio.Lock()
+
+def checks(now: datetime):
+    lookback = now - timedelta(hours=RECONCILE_CFG['lookback_hours'])
+    recording_grace = now - timedelta(minutes=RECONCILE_CFG['recording_grace_minutes'])
+    return (
+        (
+            "past_meeting",
+            "zoom.sync.past_meeting",
+            STALE_START_SQL,
+            (lookback, now - timedelta(minutes=RECONCILE_CFG['start_grace_minutes'])),
+        ),
+        (
+            "recording",
+            "zoom.sync.recording",
+            MISSING_RECORDING_SQL,
+            (
+                now - timedelta(hours=RECONCILE_CFG['recording_lookback_hours']),
+                recording_grace,
+                recording_grace,
+            ),
+        ),
+    )
+
+async def reconcile(budget: int) -> Dict[str, int]:
+    now = time.monotonic()
+    for key in [key for key, until in cooldowns.items() if until <= now]:
+        del cooldowns[key]
+
+    # each queued sync costs one zoom call; checks split the budget, unused share rolls over
+    queued = {}
+    pending = checks(datetime.now(timezone.utc))
+    for i, (check, subject, query, window) in enumerate(pending):
+        queued[check] = 0
+        share = -(-budget // (len(pending) - i))
+        if share <= 0:
+            continue
+        # over-fetch by the rows still cooling down so they cannot eat the share
+        rows = await db.aexecute_query(query, (*window, share + len(cooldowns)))
+        for row in rows or []:
+            if queued[check] >= share:
+                break
+            key = (check, row["meeting_id"])
+            if key in cooldowns:
+                continue
+            cooldowns[key] = now + RECONCILE_CFG['cooldown']
+            await nc.pub(subject, {"meeting_id": row["meeting_id"]})
+            queued[check] += 1
+        budget -= queued[check]
+
+    if any(queued.values()):
+        logger.info(f"Reconciliation queued {queued}")
+    return queued
+
+
+@nc.every(RECONCILE_CFG['interval'])
+async def scheduled_reconcile():
+    if not RECONCILE_CFG['enabled'] or lock.locked():
+        return
+    async with lock:
+        last_run.update(await reconcile(RECONCILE_CFG['call_budget']))
+
+
+@nc.reply("zoom.reconcile.run")
+async def reconcile_run(data: dict):
+    async with lock:
+        queued = await reconcile(int(data.get("budget") or RECONCILE_CFG['call_budget']))
+    return {
+        "queued": queued,
+        "cooling_down": len(cooldowns),
+        "last_scheduled": last_run,
+    }
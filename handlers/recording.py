@@ -0,0 +1,223 @@
+import logging
+from itertools import islice
+
+from common.config import RECORDING_CFG
+from common.nats_server import nc
+from common.mysql import MySQL as db
+from common.zoom import ZoomWorkspace as zm
+from common.utils import get_utc_datetime, encode_meeting_uuid
+
+import anyio
+
+logger = logging.getLogger()
+
+RECORDING_UPSERT_SQL = """
+INSERT INTO `kopilot_zoom`.`recording` (
+    `meeting_id`,
+    `meeting_uuid`,
+    `recording_url`,
+    `duration`,
+    `file_count`,
+    `total_size`
+)
+SELECT
+    m.`meeting_id`,
+    %s as `meeting_uuid`,
+    %s as `recording_url`,
+    %s as `duration`,
+    %s as `file_count`,
+    %s as `total_size`
+FROM `kopilot_zoom`.`meeting` m
+WHERE m.`meeting_id` = %s
+ON DUPLICATE KEY UPDATE
+    `recording_url` = VALUES(`recording_url`),
+    `duration` = VALUES(`duration`),
+    `file_count` = VALUES(`file_count`),
+    `total_size` = VALUES(`total_size`);
+"""
+
+RECORDING_EXISTS_SQL = """
+SELECT `id` FROM `kopilot_zoom`.`recording` WHERE `meeting_uuid` = %s LIMIT 1;
+"""
+
+# set once, after the files are stored; whoever flips it publishes zoom.recording.ready
+RECORDING_READY_SQL = """
+UPDATE `kopilot_zoom`.`recording`
+SET `ready_at` = CURRENT_TIMESTAMP(6)
+WHERE `meeting_uuid` = %s AND `ready_at` IS NULL;
+"""
+
+RECORDING_FILE_UPSERT_SQL = """
+INSERT INTO `kopilot_zoom`.`recording_file` (
+    `file_id`,
+    `meeting_id`,
+    `meeting_uuid`,
+    `recording_type`,
+    `file_type`,
+    `file_extension`,
+    `file_size`,
+    `status`,
+    `play_url`,
+    `download_url`,
+    `recording_start`,
+    `recording_end`
+) VALUES (
+    %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+)
+ON DUPLICATE KEY UPDATE
+    `status` = VALUES(`status`),
+    `file_size` = VALUES(`file_size`),
+    `play_url` = VALUES(`play_url`),
+    `download_url` = VALUES(`download_url`),
+    `recording_end` = VALUES(`recording_end`);
+"""
+
+def _utc(value):
+    return get_utc_datetime(value, "UTC") if value else None
+
+def recording_file_rows(meeting_id, meeting_uuid, recording_files):
+    for recording_file in recording_files:
+        file_id = recording_file.get("id")
+        if not file_id:
+            # transcripts in progress and some timeline files have no id yet
+            continue
+        yield (
+            file_id,
+            meeting_id,
+            meeting_uuid,
+            recording_file.get("recording_type"),
+            recording_file.get("file_type"),
+            recording_file.get("file_extension"),
+            recording_file.get("file_size"),
+            recording_file.get("status"),
+            recording_file.get("play_url"),
+            recording_file.get("download_url"),
+            _utc(recording_file.get("recording_start")),
+            _utc(recording_file.get("recording_end")),
+        )
+
+def batches(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+async def fetch_recording(meeting_uuid):
+    recording = await zm.get(f"meetings/{encode_meeting_uuid(meeting_uuid)}/recordings")
+    if not recording:
+        logger.warning(f"No recording data for meeting {meeting_uuid}")
+    return recording or {}
+
+
+async def store_recording_files(meeting_id, meeting_uuid, recording_files):
+    limiter = anyio.CapacityLimiter(RECORDING_CFG.get("concurrency", 4))
+    stored = 0
+
+    async def store(batch):
+        nonlocal stored
+        async with limiter:
+            await db.aexecute_many(RECORDING_FILE_UPSERT_SQL, batch)
+        stored += len(batch)
+
+    async with anyio.create_task_group() as tg:
+        rows = recording_file_rows(meeting_id, meeting_uuid, recording_files)
+        for batch in batches(rows, RECORDING_CFG.get("batch_size", 100)):
+            tg.start_soon(store, batch)
+    return stored
+
+
+@nc.sub("zoom.recording.completed")
+async def recording_completed(data: dict):
+
+    object = data.get("object", {})
+    meeting_id = object.get("id")
+    meeting_uuid = object.get("uuid")
+    if not meeting_id or not meeting_uuid:
+        logger.error(f"Recording event without meeting id/uuid: {object}")
+        return
+
+    recording_files = object.get("recording_files") or []
+    incomplete = (
+        not object.get("share_url")
+        or not recording_files
+        or len(recording_files) < (object.get("recording_count") or 0)
+    )
+    if incomplete and RECORDING_CFG.get("fetch_missing"):
+        fetched = await fetch_recording(meeting_uuid)
+        object = {**fetched, **{k: v for k, v in object.items() if v}}
+        if len(fetched.get("recording_files") or []) > len(recording_files):
+            recording_files = fetched["recording_files"]
+
+    await store_recording(meeting_id, meeting_uuid, object, recording_files)
+
+
+async def store_recording(meeting_id, meeting_uuid, object, recording_files):
+    try:
+        await _store_recording(meeting_id, meeting_uuid, object, recording_files)
+    except Exception as e:
+        # ready_at stays NULL; reconciliation queues zoom.sync.recording for it after the grace period
+        if isinstance(e, ExceptionGroup):
+            e = e.exceptions[0]
+        logger.error(f"Failed to store recording for meeting {meeting_uuid}: {e}")
+        await nc.pub(
+            "zoom.recording.error",
+            {
+                "meeting_id": meeting_id,
+                "meeting_uuid": meeting_uuid,
+                "error_message": str(e),
+            }
+        )
+
+
+async def _store_recording(meeting_id, meeting_uuid, object, recording_files):
+
+    share_url = object.get("share_url")
+    if not share_url:
+        logger.warning(f"Recording for meeting {meeting_uuid} has no share url, skipping.")
+        return
+
+    total_size = object.get("total_size") or sum(f.get("file_size") or 0 for f in recording_files)
+    params = (
+        meeting_uuid,
+        share_url,
+        object.get("duration"),
+        len(recording_files),
+        total_size,
+        meeting_id,
+    )
+    rowsaffected = await db.aexecute_update(RECORDING_UPSERT_SQL, params)
+    if not rowsaffected:
+        recording = await db.aexecute_query(RECORDING_EXISTS_SQL, (meeting_uuid,), fetch_one=True)
+        if not recording:
+            logger.warning(f"Recording for unknown meeting {meeting_id}, skipping.")
+            return
+
+    stored = await store_recording_files(meeting_id, meeting_uuid, recording_files)
+    logger.info(f"Stored {stored} recording files for meeting {meeting_uuid}.")
+
+    ready = await db.aexecute_update(RECORDING_READY_SQL, (meeting_uuid,))
+    if ready:
+        await nc.pub(
+            "zoom.recording.ready",
+            {
+                "meeting_id": meeting_id,
+                "meeting_uuid": meeting_uuid,
+                "recording_url": share_url,
+                "duration": object.get("duration"),
+                "file_count": len(recording_files),
+                "total_size": total_size,
+            }
+        )
+
+
+@nc.sub("zoom.sync.recording")
+async def sync_recording(data: dict):
+
+    meeting_id = data.get("meeting_id")
+    # by meeting id zoom returns the most recent instance's recording
+    recording = await zm.get(f"meetings/{meeting_id}/recordings")
+    if not recording or not recording.get("uuid"):
+        logger.info(f"No recording found for meeting {meeting_id}.")
+        return
+
+    await store_recording(meeting_id, recording["uuid"], recording, recording.get("recording_files") or [])
@@ -0,0 +1,33 @@
+from common.config import SERVICE_ROLE
+from common.nats_server import nc
+from common.mysql import MySQL as db
+from common.diagnostics import diagnostics
+from common.startup import startup
+
+@nc.reply("zoom.service.startup")
+async def service_startup(data: dict):
+    return {
+        "role": SERVICE_ROLE,
+        **startup.report()
+    }
+
+
+@nc.reply("zoom.service.mysql")
+async def service_mysql(data: dict):
+    return db.stats()
+
+
+@nc.reply("zoom.service.nats")
+async def service_nats(data: dict):
+    return nc.stats()
+
+
+@nc.reply("zoom.service.diagnostics")
+async def service_diagnostics(data: dict):
+    return diagnostics.stats()
+
+
+@nc.sub("zoom.service.profile")
+async def service_profile(data: dict):
+    # broadcast: every worker that receives it writes its own profile
+    diagnostics.request_profile(data.get("seconds"), data.get("hz"))
@@ -7,6 +7,15 @@ from common.utils import get_utc_datetime
 
 logger = logging.getLogger()
 
+PAST_MEETING_SQL = """
+UPDATE `kopilot_zoom`.`meeting`
+SET
+    `actual_start_time` = %s,
+    `actual_end_time` = %s,
+    `actual_duration` = %s
+WHERE `meeting_id` = %s;
+"""
+
 @nc.sub("zoom.sync.meeting")
 async def sync_meeting(data: dict):
 
@@ -220,4 +229,25 @@ async def sync_registrants(data: dict):
         `participated` = VALUES(`participated`) ;
     """
 
-    rowsaffected = await db.aexecute_many(query, params_list)
\ No newline at end of file
+    rowsaffected = await db.aexecute_many(query, params_list)
+
+@nc.sub("zoom.sync.past_meeting")
+async def sync_past_meeting(data: dict):
+
+    meeting_id = data.get("meeting_id")
+
+    past_meeting = await zm.get(f"past_meetings/{meeting_id}")
+    if not past_meeting or not past_meeting.get("start_time"):
+        logger.info(f"No past instance of meeting {meeting_id}, it has not started.")
+        return
+
+    start_time = get_utc_datetime(past_meeting.get("start_time"), "UTC")
+    end_time = past_meeting.get("end_time")
+    params = (
+        start_time,
+        get_utc_datetime(end_time, "UTC") if end_time else None,
+        past_meeting.get("duration"),
+        meeting_id
+    )
+    rowsaffected = await db.aexecute_update(PAST_MEETING_SQL, params)
+    logger.info(f"Synced actual start/end of meeting {meeting_id} ({rowsaffected} rows).")
@@ -1,37 +1,67 @@
-import logging
-import signal
+from common.startup import startup
 
-from common.nats_server import nc
+with startup.phase("import common"):
+    import logging
+    import signal
 
-import asyncio
-from anyio import run
+    from common.config import SERVICE_ROLE, SERVICE_SUBJECTS, SHUTDOWN_TIMEOUT
+    from common.nats_server import nc
+    from common.mysql import MySQL as db
+    from common.zoom import ZoomWorkspace as zm
+    from common.diagnostics import diagnostics
+    import handlers
+
+    import asyncio
+    from anyio import run
 
 logger = logging.getLogger()
 
 class NATSService:
     def __init__(self):
-        logger.info("Starting NATS Service")
+        logger.info(f"Starting NATS Service ({SERVICE_ROLE})")
         self.running = False
+        self._stopping = None
+        self._stopped = asyncio.Event()
 
     async def start(self):
         try:
-            await nc.connect()
-            
+            with startup.phase("discover handlers"):
+                handlers.discover(SERVICE_ROLE)
+            if SERVICE_SUBJECTS:
+                nc.enable(SERVICE_SUBJECTS)
+
+            diagnostics.install(asyncio.get_running_loop())
+
+            with startup.phase("connect"):
+                await nc.connect()
+
             self.running = True
+            startup.ready()
+            startup.log()
             logger.info("NATS Service started successfully")
-            
-            # Keep running
-            while self.running:
-                await asyncio.sleep(1)
-                
+
+            await self._stopped.wait()
+
         except Exception as e:
             logger.error(f"Failed to start NATS service: {e}")
             raise
-    
+
     async def stop(self):
+        # a second signal must not start a second drain
+        if self._stopping is None:
+            self._stopping = asyncio.ensure_future(self._shutdown())
+        await self._stopping
+
+    async def _shutdown(self):
         logger.info("Stopping NATS Service...")
         self.running = False
-        await nc.close()
+        try:
+            await nc.drain(timeout=SHUTDOWN_TIMEOUT)
+            await zm.close()
+            await db.aclose()
+            await diagnostics.uninstall()
+        finally:
+            self._stopped.set()
         logger.info("NATS Service stopped")
 
 async def main():
@@ -44,11 +74,11 @@ async def main():
     loop = asyncio.get_event_loop()
     loop.add_signal_handler(signal.SIGINT, signal_handler)
     loop.add_signal_handler(signal.SIGTERM, signal_handler)
-    
+
     try:
         await service.start()
     except KeyboardInterrupt:
         await service.stop()
 
 if __name__ == "__main__":
-    run(main)
\ No newline at end of file
+    run(main)
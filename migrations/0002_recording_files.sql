@@ -0,0 +1,39 @@
+ALTER TABLE `kopilot_zoom`.`recording`
+    ADD COLUMN `meeting_uuid` VARCHAR(255) AFTER `meeting_id`,
+    ADD COLUMN `file_count` INT AFTER `duration`,
+    ADD COLUMN `total_size` BIGINT AFTER `file_count`;
+
+-- repeated recording.completed webhooks left duplicate rows behind
+DELETE r1 FROM `kopilot_zoom`.`recording` r1
+JOIN `kopilot_zoom`.`recording` r2
+    ON r1.`meeting_id` = r2.`meeting_id`
+    AND r1.`recording_url` = r2.`recording_url`
+    AND r1.`id` > r2.`id`;
+
+ALTER TABLE `kopilot_zoom`.`recording`
+    ADD UNIQUE KEY `uk_recording_meeting_uuid` (`meeting_uuid`);
+
+CREATE TABLE IF NOT EXISTS `kopilot_zoom`.`recording_file` (
+    `id` BIGINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    `file_id` VARCHAR(255) NOT NULL,
+    `meeting_id` BIGINT NOT NULL,
+    `meeting_uuid` VARCHAR(255) NOT NULL,
+    `recording_type` VARCHAR(64),
+    `file_type` VARCHAR(32),
+    `file_extension` VARCHAR(16),
+    `file_size` BIGINT,
+    `status` VARCHAR(32),
+    `play_url` VARCHAR(1000),
+    `download_url` VARCHAR(1000),
+    `recording_start` DATETIME(6),
+    `recording_end` DATETIME(6),
+    `date_created` DATETIME(6) DEFAULT CURRENT_TIMESTAMP(6),
+    `date_modified` DATETIME(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+
+    CONSTRAINT `fk_recording_file_meeting_id`
+        FOREIGN KEY (`meeting_id`) REFERENCES `meeting`(`meeting_id`)
+        ON DELETE CASCADE ON UPDATE CASCADE,
+
+    UNIQUE KEY `uk_recording_file_file_id` (`file_id`),
+    INDEX `idx_recording_file_meeting_uuid` (`meeting_uuid`)
+);
@@ -0,0 +1,21 @@
+CREATE TABLE IF NOT EXISTS `kopilot_zoom`.`attendance` (
+    `id` BIGINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    `meeting_id` BIGINT NOT NULL,
+    `meeting_uuid` VARCHAR(255) NOT NULL,
+    `participant_key` VARCHAR(255) NOT NULL,   -- email when known, else zoom participant id
+    `email` VARCHAR(255),
+    `name` VARCHAR(255),
+    `first_join_time` DATETIME(6),
+    `last_leave_time` DATETIME(6),
+    `seconds_attended` INT DEFAULT 0,
+    `join_count` INT DEFAULT 0,
+    `is_present` BOOLEAN DEFAULT FALSE,
+    `timeline` JSON,                           -- [[join_epoch, leave_epoch], ...]
+
+    `date_created` DATETIME(6) DEFAULT CURRENT_TIMESTAMP(6),
+    `date_modified` DATETIME(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+
+    UNIQUE KEY `uk_attendance_meeting_participant` (`meeting_uuid`, `participant_key`),
+    INDEX `idx_attendance_meeting_id` (`meeting_id`),
+    INDEX `idx_attendance_email` (`email`)
+);
@@ -0,0 +1,5 @@
+-- reconciliation scans ended meetings by actual_end_time; the missing-start
+-- scan is served by idx_meeting_start_time and the recording anti-join by
+-- idx_recording_meeting_id
+ALTER TABLE `kopilot_zoom`.`meeting`
+    ADD INDEX `idx_meeting_actual_end_time` (`actual_end_time`);
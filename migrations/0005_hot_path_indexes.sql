@@ -0,0 +1,14 @@
+-- meeting_id is already UNIQUE, the plain index only doubled write cost
+ALTER TABLE `kopilot_zoom`.`meeting`
+    DROP INDEX `idx_meeting_meeting_id`;
+
+-- covers the reconciliation scan for meetings that never reported a start;
+-- start_time stays the leading column, so it replaces the single column index
+ALTER TABLE `kopilot_zoom`.`meeting`
+    ADD INDEX `idx_meeting_start_reconcile` (`start_time`, `is_deleted`, `actual_start_time`, `meeting_id`),
+    DROP INDEX `idx_meeting_start_time`;
+
+-- registrant updates filter on (meeting_id, email), served by uk_registrant_meeting_email;
+-- a second index on its leading column invited index_merge plans and is redundant for the FK
+ALTER TABLE `kopilot_zoom`.`registrant`
+    DROP INDEX `idx_registrant_meeting_id`;
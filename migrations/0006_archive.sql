@@ -0,0 +1,17 @@
+-- cold meetings and their child rows are moved here by handlers/archive.py.
+-- LIKE copies columns and indexes but no foreign keys; any later migration that
+-- changes a hot table has to change its _archive twin the same way.
+CREATE TABLE IF NOT EXISTS `kopilot_zoom`.`meeting_archive` LIKE `kopilot_zoom`.`meeting`;
+CREATE TABLE IF NOT EXISTS `kopilot_zoom`.`host_archive` LIKE `kopilot_zoom`.`host`;
+CREATE TABLE IF NOT EXISTS `kopilot_zoom`.`registrant_archive` LIKE `kopilot_zoom`.`registrant`;
+CREATE TABLE IF NOT EXISTS `kopilot_zoom`.`recording_archive` LIKE `kopilot_zoom`.`recording`;
+CREATE TABLE IF NOT EXISTS `kopilot_zoom`.`recording_file_archive` LIKE `kopilot_zoom`.`recording_file`;
+CREATE TABLE IF NOT EXISTS `kopilot_zoom`.`attendance_archive` LIKE `kopilot_zoom`.`attendance`;
+
+-- archived rows are read rarely and never updated in place
+ALTER TABLE `kopilot_zoom`.`meeting_archive` ROW_FORMAT=COMPRESSED;
+ALTER TABLE `kopilot_zoom`.`host_archive` ROW_FORMAT=COMPRESSED;
+ALTER TABLE `kopilot_zoom`.`registrant_archive` ROW_FORMAT=COMPRESSED;
+ALTER TABLE `kopilot_zoom`.`recording_archive` ROW_FORMAT=COMPRESSED;
+ALTER TABLE `kopilot_zoom`.`recording_file_archive` ROW_FORMAT=COMPRESSED;
+ALTER TABLE `kopilot_zoom`.`attendance_archive` ROW_FORMAT=COMPRESSED;
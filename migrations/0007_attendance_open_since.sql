@@ -0,0 +1,7 @@
+-- start of the session still open at the last flush, so a leave seen after a
+-- restart can be timed; kept in step with the archive twin
+ALTER TABLE `kopilot_zoom`.`attendance`
+    ADD COLUMN `open_since` DATETIME(6) AFTER `is_present`;
+
+ALTER TABLE `kopilot_zoom`.`attendance_archive`
+    ADD COLUMN `open_since` DATETIME(6) AFTER `is_present`;
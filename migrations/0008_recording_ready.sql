@@ -0,0 +1,10 @@
+-- set when a recording's files are all stored; zoom.recording.ready is published
+-- by whichever store sets it, and reconciliation re-syncs recordings left NULL
+ALTER TABLE `kopilot_zoom`.`recording`
+    ADD COLUMN `ready_at` DATETIME(6) AFTER `total_size`;
+
+ALTER TABLE `kopilot_zoom`.`recording_archive`
+    ADD COLUMN `ready_at` DATETIME(6) AFTER `total_size`;
+
+-- recordings stored before this migration already announced themselves
+UPDATE `kopilot_zoom`.`recording` SET `ready_at` = `date_created` WHERE `ready_at` IS NULL;